@@ -0,0 +1,74 @@
+import pandas as pd
+import numpy as np
+from normalizacao import normalizar_serie
+from tipos_afastamento import classificar
+
+# Em caso de sobreposição vale a primeira categoria da lista
+CATEGORIAS = ['atraso', 'atestado', 'ferias', 'outro']
+
+class IndiceAusencias:
+    """Classificação e agrupamento por Matrícula da base de ausências, feitos uma única vez"""
+
+    def __init__(self, ausencias, agregados=None, tabela=None):
+        self.ausencias = ausencias
+        # Tabela de tipos de afastamento compilada (TabelaTipos); sem ela vale a busca de texto
+        self.tabela = tabela
+        # Agregados já calculados na leitura em streaming, onde só parte das linhas é mantida
+        self._agregados = agregados
+        coluna = 'Afastamentos_Normalizado' if 'Afastamentos_Normalizado' in ausencias.columns else 'Afastamentos'
+        afastamentos = normalizar_serie(ausencias[coluna])
+
+        # A classificação roda sobre o vocabulário e é expandida pelos códigos
+        vocabulario = pd.Series(afastamentos.cat.categories, dtype=object)
+        codigos_texto = afastamentos.cat.codes.to_numpy()
+        categorias, pesos = classificar(vocabulario, tabela)
+        self.mascaras = {categoria: mascara[codigos_texto] for categoria, mascara in categorias.items()}
+        self.pesos = pesos[codigos_texto]
+        codigos_categoria = np.select(
+            [self.mascaras['atraso'], self.mascaras['atestado'], self.mascaras['ferias']],
+            [0, 1, 2],
+            default=3
+        )
+        self.categoria = pd.Categorical.from_codes(codigos_categoria, categories=CATEGORIAS)
+        self.mascaras['outro'] = codigos_categoria == 3
+
+        # Código da Matrícula de cada linha: as contagens por funcionário saem de bincount, sem ordenar
+        self.codigos, matriculas = pd.factorize(ausencias['Matricula'])
+        self.matriculas = pd.Index(matriculas, name='Matricula')
+        self._validos = self.codigos >= 0
+
+    def mascara(self, categoria):
+        return self.mascaras[categoria]
+
+    def matriculas_com(self, categoria):
+        return self.matriculas[self.contagem(categoria) > 0].to_numpy()
+
+    def contagem(self, categoria, ponderada=False):
+        pesos = self.mascaras[categoria][self._validos]
+        if ponderada:
+            pesos = pesos * self.pesos[self._validos]
+        contagem = np.bincount(self.codigos[self._validos], weights=pesos, minlength=len(self.matriculas))
+        # A contagem ponderada fica decimal: somas parciais (leitura em streaming) não perdem as frações
+        return contagem if ponderada else contagem.astype('int64')
+
+    def agregados(self):
+        """Qtd_Atestados, Tem_Atraso e Dias_Ferias por Matrícula, entrada do cálculo de prêmios"""
+        if self._agregados is not None:
+            return self._agregados
+        n = len(self.matriculas)
+        # A quantidade de dias de férias vem da segunda coluna da base
+        pos_ferias = np.flatnonzero(self.mascaras['ferias'] & self._validos)
+        status = normalizar_serie(self.ausencias.iloc[pos_ferias, 1])
+        vocabulario = pd.Series(status.cat.categories, dtype=object)
+        codigos_status = status.cat.codes.to_numpy()
+        dias = pd.to_numeric(vocabulario, errors='coerce').fillna(0).to_numpy(dtype='float64')[codigos_status]
+        # pd.to_numeric devolve inteiros quando todos os valores do funcionário são inteiros
+        nao_inteiro = ~vocabulario.str.fullmatch(r'[+-]?\d+').to_numpy(dtype=bool)[codigos_status]
+        codigos_ferias = self.codigos[pos_ferias]
+
+        return pd.DataFrame({
+            'Qtd_Atestados': self.contagem('atestado', ponderada=True),
+            'Tem_Atraso': self.contagem('atraso') > 0,
+            'Dias_Ferias': np.bincount(codigos_ferias, weights=dias, minlength=n),
+            'Ferias_Decimal': np.bincount(codigos_ferias, weights=nao_inteiro, minlength=n) > 0,
+        }, index=self.matriculas)
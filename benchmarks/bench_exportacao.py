@@ -0,0 +1,69 @@
+"""Compara tempo e pico de memória da exportação Excel com os backends openpyxl e xlsxwriter.
+
+Uso:
+    python benchmarks/bench_exportacao.py --linhas 5000 20000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from exportacao import escrever_excel
+
+STATUS = ['Tem direito', 'Não tem direito', 'Aguardando decisão', 'Férias']
+
+def gerar_resultado(linhas, semente=0):
+    rng = np.random.default_rng(semente)
+    return pd.DataFrame({
+        'Matricula': np.arange(1, linhas + 1),
+        'Nome': [f"FUNCIONÁRIO {i}" for i in range(linhas)],
+        'Cargo': rng.choice(['AUX DE LIMPEZA', 'COPEIRA', 'AUX DE SERV GERAIS'], linhas),
+        'Qtd Horas Mensais': rng.choice([120, 180, 220], linhas),
+        'Salário Mês Atual': rng.uniform(1500, 3500, linhas).round(2),
+        'Data Admissão': pd.Timestamp('2010-01-01') + pd.to_timedelta(rng.integers(0, 5000, linhas), unit='D'),
+        'Valor_Premio': rng.choice([0.0, 78.75, 157.5, 315.0], linhas),
+        'Status': rng.choice(STATUS, linhas),
+        'Detalhes': rng.choice(['', 'Jornada 4h (50%)', '1 dia de atestado (50% do valor)'], linhas),
+        'Qtd_Atestados': rng.integers(0, 4, linhas),
+    })
+
+def abas_relatorio(df):
+    # Mesmas cinco abas do relatório executivo, mais o Resumo
+    abas = [
+        ('Tem Direito', df[df['Status'] == 'Tem direito']),
+        ('Não Tem Direito', df[df['Status'] == 'Não tem direito']),
+        ('Férias', df[df['Status'] == 'Férias']),
+        ('Férias Detalhado', df[df['Status'] == 'Férias'][['Matricula', 'Nome', 'Data Admissão']]),
+        ('Atrasos', df[df['Status'] == 'Aguardando decisão']),
+        ('Resumo', pd.DataFrame([['RESUMO DO PROCESSAMENTO'], [f'Total: {len(df)}']])),
+    ]
+    return abas
+
+def medir(abas, backend):
+    inicio = time.perf_counter()
+    conteudo = escrever_excel(abas, backend=backend, sem_cabecalho=['Resumo'])
+    tempo = time.perf_counter() - inicio
+    # Segunda execução só para o pico de memória: o tracemalloc deixa a escrita bem mais lenta
+    tracemalloc.start()
+    escrever_excel(abas, backend=backend, sem_cabecalho=['Resumo'])
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tempo, pico, len(conteudo)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, nargs='+', default=[5_000, 20_000])
+    args = parser.parse_args()
+    print(f"{'linhas':>8} {'backend':>10} {'tempo (s)':>10} {'pico (MB)':>10} {'arquivo (KB)':>13}")
+    for linhas in args.linhas:
+        abas = abas_relatorio(gerar_resultado(linhas))
+        for backend in ('openpyxl', 'xlsxwriter'):
+            tempo, pico, tamanho = medir(abas, backend)
+            print(f"{linhas:>8} {backend:>10} {tempo:>10.2f} {pico / 2**20:>10.1f} {tamanho / 1024:>13.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""Mede cada etapa do processamento com bases sintéticas geradas a partir das planilhas de exemplo.
+
+Uso:
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --linhas 1000 10000 --saida bench.json
+    python benchmarks/bench_pipeline.py --linhas 100000 --comparar bench_anterior.json
+
+As bases de funcionários e de ausências são reamostradas das planilhas de exemplo, com as mesmas
+colunas e a mesma proporção de funcionários por linha de ausência. O tamanho é o número de linhas
+da base de ausências. Para cada tamanho são medidos o tempo e o pico de memória das etapas: leitura
+do Excel, normalização, cálculo dos prêmios, agregação das abas de férias/atrasos e exportação do
+Excel. O pico vem do tracemalloc numa segunda execução e inclui o que as etapas anteriores mantêm
+em memória. O resultado é gravado em JSON; com --comparar, as etapas mais lentas que o JSON
+anterior (além da tolerância) são listadas e o código de saída é 1.
+
+A execução completa, até 1 milhão de linhas, leva vários minutos.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from ausencias import IndiceAusencias
+from calculo import VERSAO_REGRAS
+from exportacao import escrever_excel
+from leitura import preparar_planilha, encontrar_coluna, COLUNAS_DATA_AUSENCIA
+from relatorio import calcular_resultado, abas_relatorio_executivo
+
+AMOSTRA_FUNCIONARIOS = os.path.join(RAIZ, 'EQUIPPE - Base Funcionarios.xlsx')
+AMOSTRA_AUSENCIAS = os.path.join(RAIZ, 'AUSENCIAS 1125.xlsx')
+DATA_LIMITE = datetime(2026, 1, 31).date()
+ETAPAS = ['leitura_excel', 'normalizacao', 'calculo_premios', 'agregacao_ferias_atrasos', 'exportacao_excel']
+
+def gerar_bases(linhas, data_limite=DATA_LIMITE, semente=0):
+    """Bases de funcionários e ausências sintéticas, com linhas reamostradas das planilhas de exemplo"""
+    rng = np.random.default_rng(semente)
+    modelo_func = preparar_planilha(pd.read_excel(AMOSTRA_FUNCIONARIOS))
+    modelo_aus = preparar_planilha(pd.read_excel(AMOSTRA_AUSENCIAS))
+
+    qtd_func = max(1, round(linhas * len(modelo_func) / len(modelo_aus)))
+    func = modelo_func.iloc[rng.integers(0, len(modelo_func), qtd_func)].reset_index(drop=True)
+    func['Matricula'] = np.arange(1, qtd_func + 1)
+    func['Nome'] = func['Nome'] + ' ' + func['Matricula'].astype(str)
+
+    aus = modelo_aus.iloc[rng.integers(0, len(modelo_aus), linhas)].reset_index(drop=True)
+    dono = rng.integers(0, qtd_func, linhas)
+    aus['Matricula'] = func['Matricula'].to_numpy()[dono]
+    aus['Nome'] = func['Nome'].to_numpy()[dono]
+    inicio_mes = pd.Timestamp(data_limite.year, data_limite.month, 1)
+    dias = inicio_mes + pd.to_timedelta(rng.integers(0, data_limite.day, linhas), unit='D')
+    aus['Dia'] = dias.strftime('%d/%m/%Y')
+    # Nas planilhas de exemplo nenhuma linha de férias tem falta 'F'; metade delas recebe 'F'
+    # para que as abas de férias também sejam exercitadas
+    ferias = aus['Afastamentos'].str.contains('Férias', na=False).to_numpy() & (rng.random(linhas) < 0.5)
+    aus.loc[ferias, 'Falta'] = 'F'
+    return func, aus
+
+def planilha(df):
+    return escrever_excel([('Planilha1', df)])
+
+def executar_etapas(conteudo_func, conteudo_aus, medir_memoria=False):
+    """Executa as etapas em sequência e devolve {etapa: segundos} ou {etapa: bytes de pico}"""
+    medidas = {}
+    estado = {}
+
+    def etapa(nome, funcao):
+        if medir_memoria:
+            tracemalloc.reset_peak()
+            funcao()
+            medidas[nome] = tracemalloc.get_traced_memory()[1]
+        else:
+            inicio = time.perf_counter()
+            funcao()
+            medidas[nome] = time.perf_counter() - inicio
+
+    def leitura():
+        estado['func'] = pd.read_excel(io.BytesIO(conteudo_func))
+        estado['aus'] = pd.read_excel(io.BytesIO(conteudo_aus))
+
+    def normalizacao():
+        # Mesmo preparo de carregar_bases
+        estado['func'] = preparar_planilha(estado['func'])
+        df_aus = preparar_planilha(estado['aus'], ['Afastamentos'], compactar=True)
+        estado['indice'] = IndiceAusencias(df_aus)
+        col_data = encontrar_coluna(df_aus, COLUNAS_DATA_AUSENCIA)
+        if col_data:
+            df_aus[col_data] = pd.to_datetime(df_aus[col_data], errors='coerce', dayfirst=True)
+        estado['aus'] = df_aus
+
+    def calculo():
+        estado['resultado'] = calcular_resultado(estado['func'], estado['aus'], estado['indice'], DATA_LIMITE)
+
+    def agregacao():
+        estado['abas'] = abas_relatorio_executivo(estado['resultado'], DATA_LIMITE)
+
+    def exportacao():
+        escrever_excel(estado['abas'])
+
+    if medir_memoria:
+        tracemalloc.start()
+    try:
+        for nome, funcao in zip(ETAPAS, [leitura, normalizacao, calculo, agregacao, exportacao]):
+            etapa(nome, funcao)
+    finally:
+        if medir_memoria:
+            tracemalloc.stop()
+    return medidas
+
+def medir(linhas, medir_memoria=True):
+    func, aus = gerar_bases(linhas)
+    conteudo_func, conteudo_aus = planilha(func), planilha(aus)
+    tempos = executar_etapas(conteudo_func, conteudo_aus)
+    picos = executar_etapas(conteudo_func, conteudo_aus, medir_memoria=True) if medir_memoria else {}
+    return {
+        'linhas_ausencias': linhas,
+        'linhas_funcionarios': len(func),
+        'etapas': {
+            nome: {
+                'tempo_s': round(tempos[nome], 4),
+                'pico_memoria_mb': round(picos[nome] / 2**20, 2) if nome in picos else None,
+            }
+            for nome in ETAPAS
+        },
+        'tempo_total_s': round(sum(tempos.values()), 4),
+    }
+
+def regressoes(atual, anterior, tolerancia):
+    """Etapas cujo tempo passou do tempo anterior mais a tolerância (fração), por tamanho"""
+    anteriores = {r['linhas_ausencias']: r for r in anterior['resultados']}
+    lentas = []
+    for r in atual['resultados']:
+        base = anteriores.get(r['linhas_ausencias'])
+        if base is None:
+            continue
+        for nome, medida in r['etapas'].items():
+            tempo_base = base['etapas'].get(nome, {}).get('tempo_s')
+            if tempo_base and medida['tempo_s'] > tempo_base * (1 + tolerancia):
+                lentas.append((r['linhas_ausencias'], nome, tempo_base, medida['tempo_s']))
+    return lentas
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--linhas', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--saida', default=None, help="Arquivo JSON de saída (padrão: bench_pipeline_<data>.json)")
+    parser.add_argument('--sem-memoria', action='store_true', help="Não executa a segunda passada com tracemalloc")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument('--tolerancia', type=float, default=0.25, help="Aumento de tempo aceito (padrão: 0.25)")
+    args = parser.parse_args()
+
+    relatorio = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'versao_regras': VERSAO_REGRAS,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'resultados': [],
+    }
+    print(f"{'linhas':>9} {'etapa':<26} {'tempo (s)':>10} {'pico (MB)':>10}")
+    for linhas in args.linhas:
+        r = medir(linhas, medir_memoria=not args.sem_memoria)
+        relatorio['resultados'].append(r)
+        for nome, medida in r['etapas'].items():
+            pico = medida['pico_memoria_mb']
+            print(f"{linhas:>9} {nome:<26} {medida['tempo_s']:>10.3f} {pico if pico is not None else '-':>10}")
+
+    saida = args.saida or f"bench_pipeline_{datetime.now():%Y%m%d_%H%M%S}.json"
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            lentas = regressoes(relatorio, json.load(f), args.tolerancia)
+        for linhas, nome, antes, depois in lentas:
+            print(f"REGRESSÃO {linhas} linhas, {nome}: {antes:.3f}s -> {depois:.3f}s")
+        return 1 if lentas else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Perfil de memória do processamento (leitura, cálculo e relatório executivo) de um par de bases.
+
+Uso:
+    python benchmarks/perfil_memoria.py
+    python benchmarks/perfil_memoria.py --funcionarios base.xlsx --ausencias ausencias.xlsx --data-limite 2026-01-31
+
+Sem argumentos usa as planilhas de exemplo do repositório. Mostra o pico de memória residente
+(RSS) do processo e o tamanho em memória de cada DataFrame do resultado.
+"""
+import argparse
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from lote import ler_data
+from relatorio import carregar_bases, calcular_resultado, gerar_relatorio_executivo
+
+def pico_rss():
+    """Pico de memória residente do processo, em bytes"""
+    try:
+        import resource
+        # ru_maxrss vem em KB no Linux e em bytes no macOS
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico if sys.platform == 'darwin' else pico * 1024
+    except ImportError:
+        import psutil
+        memoria = psutil.Process().memory_info()
+        return getattr(memoria, 'peak_wset', memoria.rss)
+
+def tamanho_df(df):
+    return int(df.memory_usage(deep=True).sum())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--funcionarios', default=os.path.join(RAIZ, 'EQUIPPE - Base Funcionarios.xlsx'))
+    parser.add_argument('--ausencias', default=os.path.join(RAIZ, 'AUSENCIAS 1125.xlsx'))
+    parser.add_argument('--data-limite', type=ler_data, default=ler_data('2026-01-31'))
+    parser.add_argument('--streaming', action='store_true', help="Leitura em streaming das bases de ausências")
+    args = parser.parse_args()
+
+    etapas = []
+    inicio = pico_rss()
+    t = time.perf_counter()
+    df_func, df_aus, indice_aus = carregar_bases(args.funcionarios, args.ausencias, streaming=args.streaming)
+    etapas.append(('leitura', time.perf_counter() - t, pico_rss()))
+    t = time.perf_counter()
+    resultado = calcular_resultado(df_func, df_aus, indice_aus, args.data_limite)
+    etapas.append(('cálculo', time.perf_counter() - t, pico_rss()))
+    t = time.perf_counter()
+    gerar_relatorio_executivo(resultado, args.data_limite)
+    etapas.append(('relatório', time.perf_counter() - t, pico_rss()))
+
+    print(f"{'etapa':<12} {'tempo (s)':>10} {'pico RSS (MB)':>14}")
+    print(f"{'importação':<12} {'':>10} {inicio / 2**20:>14.1f}")
+    for nome, tempo, pico in etapas:
+        print(f"{nome:<12} {tempo:>10.2f} {pico / 2**20:>14.1f}")
+    print(f"Aumento do pico durante o processamento: {(etapas[-1][2] - inicio) / 2**20:.1f} MB")
+    print()
+    print(f"{'DataFrame':<16} {'linhas':>8} {'memória (KB)':>13}")
+    for nome, df in [('funcionários', resultado.df_func), ('ausências', resultado.df_aus),
+                     ('férias', resultado.ferias_aus_all), ('resultado', resultado.df_final)]:
+        print(f"{nome:<16} {len(df):>8} {tamanho_df(df) / 1024:>13.0f}")
+
+if __name__ == '__main__':
+    main()
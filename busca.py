@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from normalizacao import normalizar_serie, normalizar_texto
+
+ORDENACOES = ["Nome (A-Z)", "Nome (Z-A)", "Matrícula (Crescente)", "Matrícula (Decrescente)"]
+
+def _prefixo(valores_ordenados, posicoes, prefixo, total):
+    # Linhas cujo valor começa com o prefixo: faixa contígua no vetor ordenado
+    inicio = np.searchsorted(valores_ordenados, prefixo, side='left')
+    fim = np.searchsorted(valores_ordenados, prefixo + '\uffff', side='left')
+    mascara = np.zeros(total, dtype=bool)
+    mascara[posicoes[inicio:fim]] = True
+    return mascara
+
+def _ordenar(valores):
+    ordem = np.argsort(valores, kind='stable')
+    return valores[ordem], ordem
+
+class IndiceBusca:
+    """Índice de busca por Nome e Matrícula e ordenações prontas do DataFrame do editor"""
+
+    def __init__(self, df):
+        self.total = len(df)
+        # Palavras dos nomes sem acento e em minúsculas, ordenadas para busca por prefixo
+        nomes = normalizar_serie(df['Nome']).astype(object)
+        palavras = pd.Series(nomes.to_numpy(), index=np.arange(self.total)).str.split().explode().dropna()
+        self._palavras, ordem = _ordenar(palavras.to_numpy(dtype=object))
+        self._pos_palavras = palavras.index.to_numpy()[ordem]
+
+        # Matrícula vazia vira '': NaN no meio dos textos impediria a ordenação
+        matriculas = df['Matricula'].astype(object).where(df['Matricula'].notna(), '').astype(str).to_numpy(dtype=object)
+        self._matriculas, self._pos_matriculas = _ordenar(matriculas)
+
+        posicoes = pd.RangeIndex(self.total)
+        nome = pd.Series(df['Nome'].to_numpy(), index=posicoes)
+        matricula = pd.Series(df['Matricula'].to_numpy(), index=posicoes)
+        self.ordenacoes = {
+            "Nome (A-Z)": nome.sort_values(kind='stable').index.to_numpy(),
+            "Nome (Z-A)": nome.sort_values(ascending=False, kind='stable').index.to_numpy(),
+            "Matrícula (Crescente)": matricula.sort_values(kind='stable').index.to_numpy(),
+            "Matrícula (Decrescente)": matricula.sort_values(ascending=False, kind='stable').index.to_numpy(),
+        }
+
+    def buscar(self, matricula='', nome=''):
+        """Máscara das linhas cuja matrícula começa com o texto e cujo nome tem palavras com os prefixos buscados"""
+        mascara = np.ones(self.total, dtype=bool)
+        matricula = str(matricula).strip()
+        if matricula:
+            mascara &= _prefixo(self._matriculas, self._pos_matriculas, matricula, self.total)
+        for termo in normalizar_texto(nome).split():
+            mascara &= _prefixo(self._palavras, self._pos_palavras, termo, self.total)
+        return mascara
+
+    def posicoes(self, mascara, ordem):
+        """Posições das linhas selecionadas pela máscara, já na ordenação escolhida"""
+        permutacao = self.ordenacoes[ordem]
+        return permutacao[mascara[permutacao]]
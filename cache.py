@@ -0,0 +1,115 @@
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import pandas as pd
+
+def tamanho_em_bytes(valor):
+    """Estimativa do espaço ocupado em memória, usada para o limite do cache"""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if isinstance(valor, dict):
+        return sum(tamanho_em_bytes(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sum(tamanho_em_bytes(v) for v in valor)
+    return sys.getsizeof(valor)
+
+class CacheLRU:
+    """Cache em memória com descarte do item usado há mais tempo ao passar do limite de bytes.
+
+    É um objeto do processo: no Streamlit, todas as sessões abertas usam o mesmo cache.
+    """
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self._itens = OrderedDict()
+        self._total = 0
+        self._lock = threading.RLock()
+        # Chaves sendo calculadas agora por obter_ou_calcular
+        self._em_calculo = {}
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            if chave not in self._itens:
+                return padrao
+            self._itens.move_to_end(chave)
+            return self._itens[chave][0]
+
+    def guardar(self, chave, valor, tamanho=None):
+        if tamanho is None:
+            tamanho = tamanho_em_bytes(valor)
+        with self._lock:
+            self.remover(chave)
+            # Itens maiores que o próprio limite não são guardados
+            if tamanho > self.limite_bytes:
+                return
+            self._itens[chave] = (valor, tamanho)
+            self._total += tamanho
+            while self._total > self.limite_bytes:
+                _, (_, tamanho_antigo) = self._itens.popitem(last=False)
+                self._total -= tamanho_antigo
+
+    def obter_ou_calcular(self, chave, calcular, tamanho=None):
+        """Valor em cache ou calcular(), guardado em seguida.
+
+        Chamadas simultâneas com a mesma chave calculam uma vez só: as outras esperam e recebem o
+        mesmo valor (ou a mesma exceção). tamanho pode ser uma função do valor calculado.
+        """
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave][0]
+            futuro = self._em_calculo.get(chave)
+            calcula_aqui = futuro is None
+            if calcula_aqui:
+                futuro = self._em_calculo[chave] = Future()
+        if not calcula_aqui:
+            try:
+                return futuro.result()
+            except Exception:
+                raise
+            except BaseException:
+                # Quem calculava foi interrompido (por exemplo, a sessão dele recarregou a página)
+                return self.obter_ou_calcular(chave, calcular, tamanho)
+        try:
+            valor = calcular()
+            self.guardar(chave, valor, tamanho=tamanho(valor) if callable(tamanho) else tamanho)
+        except BaseException as e:
+            # A chave sai de _em_calculo antes de acordar quem espera: quem assume o cálculo não
+            # encontra de novo o futuro que falhou
+            self._encerrar_calculo(chave)
+            futuro.set_exception(e)
+            raise
+        self._encerrar_calculo(chave)
+        futuro.set_result(valor)
+        return valor
+
+    def _encerrar_calculo(self, chave):
+        with self._lock:
+            del self._em_calculo[chave]
+
+    def remover(self, chave):
+        with self._lock:
+            if chave in self._itens:
+                _, tamanho = self._itens.pop(chave)
+                self._total -= tamanho
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._total = 0
+
+    @property
+    def total_bytes(self):
+        return self._total
+
+    def __contains__(self, chave):
+        with self._lock:
+            return chave in self._itens
+
+    def __len__(self):
+        return len(self._itens)
@@ -0,0 +1,77 @@
+import pandas as pd
+import numpy as np
+
+VALOR_BASE = 315.00
+SALARIO_LIMITE = 2720.86
+# Incrementar sempre que as regras mudarem: invalida os resultados guardados em cache
+VERSAO_REGRAS = 2
+PARAMETROS_REGRAS = (VERSAO_REGRAS, VALOR_BASE, SALARIO_LIMITE)
+
+def _juntar_detalhes(*partes):
+    detalhes = partes[0]
+    for parte in partes[1:]:
+        separador = np.where((detalhes != '') & (parte != ''), '; ', '')
+        detalhes = detalhes + separador + parte
+    return detalhes
+
+def calcular_premios(funcionarios, agregados, col_horas, col_salario):
+    """Calcula Valor_Premio, Status, Detalhes e Qtd_Atestados para todos os funcionários"""
+    agg = agregados.reindex(funcionarios['Matricula'])
+    # Atestados com peso fracionário: a soma do funcionário é arredondada (meio para cima)
+    dias_atestado = np.floor(agg['Qtd_Atestados'].fillna(0).to_numpy(dtype='float64').round(6) + 0.5).astype('int64')
+    tem_atraso = agg['Tem_Atraso'].fillna(False).astype(bool).to_numpy()
+    dias_ferias = agg['Dias_Ferias'].fillna(0).to_numpy(dtype='float64')
+    ferias_decimal = agg['Ferias_Decimal'].fillna(False).astype(bool).to_numpy()
+    horas = pd.to_numeric(funcionarios[col_horas], errors='coerce').to_numpy(dtype='float64')
+    salario = pd.to_numeric(funcionarios[col_salario], errors='coerce').to_numpy(dtype='float64')
+    vazio = np.full(len(funcionarios), '', dtype=object)
+
+    # Regras de cálculo padrão
+    acima_limite = salario > SALARIO_LIMITE
+    perde_direito = ~acima_limite & (dias_atestado >= 3)
+    valor = np.select(
+        [acima_limite | perde_direito, dias_atestado == 2, dias_atestado == 1],
+        [0.0, VALOR_BASE * 0.25, VALOR_BASE * 0.5],
+        default=VALOR_BASE
+    )
+    status = np.where(acima_limite | perde_direito, 'Não tem direito', 'Tem direito').astype(object)
+    det_regra = np.select(
+        [acima_limite, perde_direito, dias_atestado == 2, dias_atestado == 1],
+        [
+            'Salário acima do limite',
+            pd.Series(dias_atestado).astype(str).to_numpy(dtype=object) + ' dias de atestado (perde o direito)',
+            '2 dias de atestado (25% do valor)',
+            '1 dia de atestado (50% do valor)',
+        ],
+        default=''
+    ).astype(object)
+
+    # Jornada 4h
+    jornada = (horas <= 120) & (valor > 0)
+    valor = np.where(jornada, np.round(valor * 0.5, 2), valor)
+    det_jornada = np.where(jornada, 'Jornada 4h (50%)', vazio)
+
+    # Desconto proporcional de férias
+    desconto_ferias = (dias_ferias > 0) & (valor > 0)
+    desconto = np.minimum(dias_ferias / 30, 1)
+    valor = np.where(desconto_ferias, np.round(valor * (1 - desconto), 2), valor)
+    dias_texto = np.where(
+        ferias_decimal,
+        pd.Series(dias_ferias).astype(str).to_numpy(dtype=object),
+        pd.Series(dias_ferias.astype('int64')).astype(str).to_numpy(dtype=object)
+    )
+    det_ferias = np.where(desconto_ferias, 'Desconto férias: ' + dias_texto + ' dias', vazio)
+
+    detalhes = _juntar_detalhes(det_regra, det_jornada, det_ferias)
+
+    # Atraso prevalece sobre as demais regras
+    valor = np.where(tem_atraso, 0.0, valor)
+    status = np.where(tem_atraso, 'Aguardando decisão', status)
+    detalhes = np.where(tem_atraso, 'Afastamento: Atraso', detalhes)
+
+    return pd.DataFrame({
+        'Valor_Premio': valor,
+        'Status': status,
+        'Detalhes': detalhes,
+        'Qtd_Atestados': dias_atestado
+    }, index=funcionarios.index)
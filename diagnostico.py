@@ -0,0 +1,157 @@
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+
+# Registros mantidos por sessão; os mais antigos são descartados
+LIMITE_REGISTROS = 2000
+
+# Diagnóstico ativo na execução atual (cada sessão do Streamlit roda na sua própria thread)
+_ativo = contextvars.ContextVar('diagnostico', default=None)
+# Profundidade das etapas em andamento: fica no contexto, e não no Diagnostico, porque as exportações
+# em segundo plano herdam o diagnóstico da sessão e medem etapas em outras threads ao mesmo tempo
+_nivel = contextvars.ContextVar('nivel_etapa', default=0)
+# Execução a que pertencem as etapas do contexto: uma exportação continua na execução que a enviou
+_execucao = contextvars.ContextVar('execucao', default=None)
+
+def _memoria_atual():
+    """Memória residente do processo em bytes (psutil, ou /proc no Linux sem psutil)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError, IndexError):
+        return None
+
+def _linhas(valor):
+    if valor is None or isinstance(valor, (str, bytes)):
+        return None
+    if isinstance(valor, int):
+        return valor
+    return len(valor) if hasattr(valor, '__len__') else None
+
+class Diagnostico:
+    """Tempo, linhas de entrada e saída e variação de memória de cada etapa das execuções"""
+
+    def __init__(self):
+        self.registros = []
+        self.execucao = None
+        self._lock = threading.Lock()
+
+    def iniciar_execucao(self):
+        self.execucao = datetime.now().isoformat(timespec='milliseconds')
+        return self.execucao
+
+    def registrar(self, registro):
+        with self._lock:
+            self.registros.append(registro)
+            del self.registros[:-LIMITE_REGISTROS]
+
+    def _copia(self):
+        with self._lock:
+            return list(self.registros)
+
+    def tabela(self, execucao=None):
+        """Etapas de uma execução (por padrão a última) num DataFrame, na ordem em que começaram"""
+        execucao = execucao or self.execucao
+        linhas = [r for r in self._copia() if r['execucao'] == execucao]
+        colunas = ['etapa', 'tempo_s', 'linhas_entrada', 'linhas_saida', 'memoria_delta_mb', 'detalhe']
+        if not linhas:
+            return pd.DataFrame(columns=colunas)
+        df = pd.DataFrame(linhas).sort_values('ordem', kind='stable')
+        # Etapas internas aparecem recuadas sob a etapa que as chamou
+        df['etapa'] = ['    ' * n + e for n, e in zip(df['nivel'], df['etapa'])]
+        return df.reindex(columns=colunas).reset_index(drop=True)
+
+    def log(self):
+        """Todos os registros em JSON Lines, um objeto por etapa"""
+        return '\n'.join(json.dumps(r, ensure_ascii=False, default=str) for r in self._copia()) + '\n'
+
+@contextmanager
+def coletar(diagnostico=None):
+    """Ativa o diagnóstico para as etapas executadas dentro do bloco, como uma nova execução"""
+    diagnostico = diagnostico or Diagnostico()
+    token = _ativo.set(diagnostico)
+    token_execucao = _execucao.set(diagnostico.iniciar_execucao())
+    try:
+        yield diagnostico
+    finally:
+        _execucao.reset(token_execucao)
+        _ativo.reset(token)
+
+@contextmanager
+def etapa(nome, entrada=None):
+    """Mede o bloco como uma etapa do diagnóstico ativo; sem diagnóstico ativo não mede nada.
+
+    O bloco recebe um dict onde pode informar a saída (registro['saida'] = DataFrame ou número
+    de linhas) e um texto livre em registro['detalhe'].
+    """
+    diagnostico = _ativo.get()
+    registro = {}
+    if diagnostico is None:
+        yield registro
+        return
+    nivel = _nivel.get()
+    registro.update(
+        execucao=_execucao.get() or diagnostico.execucao, ordem=time.perf_counter(), nivel=nivel,
+        etapa=nome, linhas_entrada=_linhas(entrada),
+    )
+    memoria = _memoria_atual()
+    token = _nivel.set(nivel + 1)
+    try:
+        yield registro
+    except Exception as e:
+        registro['detalhe'] = f"erro: {type(e).__name__}: {e}"
+        raise
+    finally:
+        _nivel.reset(token)
+        registro['tempo_s'] = round(time.perf_counter() - registro['ordem'], 4)
+        registro['linhas_saida'] = _linhas(registro.pop('saida', None))
+        memoria_final = _memoria_atual()
+        registro['memoria_delta_mb'] = (
+            round((memoria_final - memoria) / 2**20, 2) if memoria is not None else None
+        )
+        diagnostico.registrar(registro)
+
+def ferramentas_perfil():
+    """Perfiladores disponíveis: cProfile sempre, pyinstrument se estiver instalado"""
+    try:
+        import pyinstrument  # noqa: F401
+        return ['cProfile', 'pyinstrument']
+    except ImportError:
+        return ['cProfile']
+
+@contextmanager
+def perfilar(ferramenta='cProfile', linhas=40):
+    """Perfil de execução do bloco; o relatório em texto fica em perfil['texto'] ao final"""
+    perfil = {'ferramenta': ferramenta}
+    if ferramenta == 'pyinstrument':
+        from pyinstrument import Profiler
+        perfilador = Profiler()
+        perfilador.start()
+        try:
+            yield perfil
+        finally:
+            perfilador.stop()
+            perfil['texto'] = perfilador.output_text(unicode=True)
+        return
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+    try:
+        yield perfil
+    finally:
+        perfilador.disable()
+        saida = io.StringIO()
+        pstats.Stats(perfilador, stream=saida).sort_stats('cumulative').print_stats(linhas)
+        perfil['texto'] = saida.getvalue()
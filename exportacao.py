@@ -0,0 +1,70 @@
+import io
+import os
+import pandas as pd
+from diagnostico import etapa
+
+# Backend padrão de escrita dos arquivos Excel ('xlsxwriter' ou 'openpyxl')
+BACKEND_EXCEL = os.environ.get('ASSIDUIDADE_BACKEND_EXCEL', 'xlsxwriter')
+
+def _valores_coluna(serie):
+    # Objetos Python prontos para a célula; valores ausentes viram células vazias
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+def _escrever_openpyxl(abas, sem_cabecalho):
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        for nome_aba, df in abas:
+            df.to_excel(writer, index=False, header=nome_aba not in sem_cabecalho, sheet_name=nome_aba)
+    return output.getvalue()
+
+def _escrever_xlsxwriter(abas, sem_cabecalho):
+    import xlsxwriter
+    output = io.BytesIO()
+    # constant_memory: cada linha vai para disco assim que a seguinte começa, então as linhas
+    # são escritas em ordem (o to_excel do pandas escreve coluna a coluna e não serve aqui)
+    livro = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+    })
+    formato_cabecalho = livro.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+    formato_data = livro.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss'})
+    for nome_aba, df in abas:
+        planilha = livro.add_worksheet(nome_aba)
+        linha = 0
+        if nome_aba not in sem_cabecalho:
+            planilha.write_row(0, 0, [str(c) for c in df.columns], formato_cabecalho)
+            linha = 1
+        colunas = []
+        for i in range(df.shape[1]):
+            serie = df.iloc[:, i]
+            # Formato definido uma vez por coluna, não por célula
+            if pd.api.types.is_datetime64_any_dtype(serie):
+                planilha.set_column(i, i, 19, formato_data)
+            colunas.append(_valores_coluna(serie))
+        for valores in zip(*colunas):
+            planilha.write_row(linha, 0, valores)
+            linha += 1
+    livro.close()
+    return output.getvalue()
+
+BACKENDS = {
+    'openpyxl': _escrever_openpyxl,
+    'xlsxwriter': _escrever_xlsxwriter,
+}
+
+def escrever_excel(abas, backend=None, sem_cabecalho=()):
+    """Escreve as abas [(nome, DataFrame), ...] num arquivo Excel e devolve os bytes.
+
+    As abas em sem_cabecalho são escritas sem a linha de nomes das colunas (ex.: Resumo).
+    """
+    backend = backend or BACKEND_EXCEL
+    if backend == 'xlsxwriter':
+        try:
+            import xlsxwriter  # noqa: F401
+        except ImportError:
+            backend = 'openpyxl'
+    with etapa('escrita_excel', sum(len(df) for _, df in abas)) as registro:
+        conteudo = BACKENDS[backend](abas, set(sem_cabecalho))
+        registro['detalhe'] = f"{backend}, {len(conteudo) / 1024:.0f} KB"
+    return conteudo
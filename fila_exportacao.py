@@ -0,0 +1,147 @@
+import contextvars
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+# Exportações executando ao mesmo tempo no processo, somando todas as sessões
+MAX_EXECUTANDO = 4
+# Exportações na fila ou executando por sessão: uma sessão não ocupa a fila inteira
+MAX_PENDENTES_SESSAO = 2
+# Arquivos prontos mantidos por sessão para download; os mais antigos são descartados
+MAX_CONCLUIDAS_SESSAO = 10
+# Limite de bytes dos arquivos prontos somando todas as sessões; os mais antigos são descartados
+LIMITE_BYTES_CONCLUIDAS = 256 * 1024 * 1024
+# Sessões sem consultar a fila por esse tempo (segundos) perdem os arquivos prontos
+EXPIRACAO_SESSAO_S = 60 * 60
+
+NA_FILA = 'na fila'
+EXECUTANDO = 'executando'
+CONCLUIDA = 'concluída'
+ERRO = 'erro'
+
+@dataclass
+class Tarefa:
+    """Uma exportação em segundo plano e o arquivo gerado por ela"""
+    id: int
+    sessao: str
+    descricao: str
+    nome_arquivo: str
+    chave: tuple = None
+    estado: str = NA_FILA
+    progresso: float = 0.0
+    mensagem: str = ''
+    conteudo: bytes = None
+    avisos: list = field(default_factory=list)
+    erro: str = None
+    criada_em: datetime = field(default_factory=datetime.now)
+    tempo_s: float = None
+
+    @property
+    def terminada(self):
+        return self.estado in (CONCLUIDA, ERRO)
+
+    def avancar(self, fracao, mensagem=''):
+        """Atualiza o progresso (0 a 1) mostrado na tela"""
+        self.progresso = min(max(fracao, 0.0), 1.0)
+        self.mensagem = mensagem
+
+class FilaExportacao:
+    """Fila de exportações executadas em threads, compartilhada pelas sessões do processo.
+
+    Cada tarefa recebe a própria Tarefa, informa o progresso com tarefa.avancar e devolve os bytes
+    do arquivo, que ficam guardados na tarefa até serem descartados: pelo limite por sessão, pelo
+    limite de bytes do processo (os mais antigos primeiro) ou quando a sessão deixa de consultar a
+    fila por expiracao_s segundos.
+    """
+
+    def __init__(self, max_executando=MAX_EXECUTANDO, max_pendentes_sessao=MAX_PENDENTES_SESSAO,
+                 max_concluidas_sessao=MAX_CONCLUIDAS_SESSAO, limite_bytes=LIMITE_BYTES_CONCLUIDAS,
+                 expiracao_s=EXPIRACAO_SESSAO_S):
+        self.max_pendentes_sessao = max_pendentes_sessao
+        self.max_concluidas_sessao = max_concluidas_sessao
+        self.limite_bytes = limite_bytes
+        self.expiracao_s = expiracao_s
+        self._executor = ThreadPoolExecutor(max_workers=max_executando, thread_name_prefix='exportacao')
+        self._tarefas = {}
+        # Último acesso de cada sessão (time.monotonic), para descartar as sessões fechadas
+        self._acessos = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def enviar(self, sessao, descricao, nome_arquivo, funcao, chave=None):
+        """Coloca funcao(tarefa) na fila e devolve a tarefa.
+
+        Com chave, uma tarefa da sessão com a mesma chave que não falhou é devolvida no lugar de
+        gerar o arquivo de novo. Levanta RuntimeError se a sessão já tem tarefas demais pendentes.
+        """
+        with self._lock:
+            self._acessos[sessao] = time.monotonic()
+            if chave is not None:
+                for tarefa in self._tarefas.values():
+                    if tarefa.sessao == sessao and tarefa.chave == chave and tarefa.estado != ERRO:
+                        return tarefa
+            pendentes = sum(1 for t in self._tarefas.values() if t.sessao == sessao and not t.terminada)
+            if pendentes >= self.max_pendentes_sessao:
+                raise RuntimeError(
+                    f"Já há {pendentes} exportação(ões) em andamento nesta sessão; aguarde terminarem."
+                )
+            tarefa = Tarefa(next(self._ids), sessao, descricao, nome_arquivo, chave)
+            self._tarefas[tarefa.id] = tarefa
+        # A tarefa herda o contexto de quem enviou (por exemplo, o diagnóstico ativo)
+        self._executor.submit(contextvars.copy_context().run, self._executar, tarefa, funcao)
+        return tarefa
+
+    def _executar(self, tarefa, funcao):
+        tarefa.estado = EXECUTANDO
+        inicio = time.perf_counter()
+        try:
+            tarefa.conteudo = funcao(tarefa)
+            tarefa.avancar(1.0, 'Arquivo pronto')
+            tarefa.estado = CONCLUIDA
+        except Exception as e:
+            tarefa.erro = f"{type(e).__name__}: {e}"
+            tarefa.estado = ERRO
+        finally:
+            tarefa.tempo_s = round(time.perf_counter() - inicio, 2)
+            with self._lock:
+                self._descartar(tarefa.sessao)
+
+    def _descartar(self, sessao):
+        # Chamado com o lock: limite por sessão, sessões inativas e limite de bytes do processo
+        terminadas = [t.id for t in self._tarefas.values() if t.sessao == sessao and t.terminada]
+        for id_tarefa in terminadas[:-self.max_concluidas_sessao]:
+            del self._tarefas[id_tarefa]
+
+        agora = time.monotonic()
+        inativas = {s for s, acesso in self._acessos.items() if agora - acesso > self.expiracao_s}
+        for id_tarefa in [t.id for t in self._tarefas.values() if t.sessao in inativas and t.terminada]:
+            del self._tarefas[id_tarefa]
+        pendentes = {t.sessao for t in self._tarefas.values()}
+        for s in inativas - pendentes:
+            del self._acessos[s]
+
+        total = sum(len(t.conteudo or b'') for t in self._tarefas.values())
+        for tarefa in [t for t in self._tarefas.values() if t.terminada]:
+            if total <= self.limite_bytes:
+                break
+            total -= len(tarefa.conteudo or b'')
+            del self._tarefas[tarefa.id]
+
+    def tarefas(self, sessao):
+        """Tarefas da sessão, da mais antiga para a mais recente"""
+        with self._lock:
+            self._acessos[sessao] = time.monotonic()
+            self._descartar(sessao)
+            return [t for t in self._tarefas.values() if t.sessao == sessao]
+
+    def remover(self, id_tarefa):
+        with self._lock:
+            tarefa = self._tarefas.get(id_tarefa)
+            if tarefa is not None and tarefa.terminada:
+                del self._tarefas[id_tarefa]
+
+# Fila única do processo: todas as sessões do Streamlit dividem os mesmos workers
+fila = FilaExportacao()
@@ -0,0 +1,215 @@
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+import pandas as pd
+
+# Banco SQLite com os resultados de cada competência (mês de referência)
+CAMINHO_HISTORICO = os.environ.get('ASSIDUIDADE_HISTORICO', 'historico_assiduidade.sqlite3')
+
+# Cada competência guarda o resultado de várias bases (uma por unidade ou CNPJ), separadas pela
+# origem: o nome da unidade informado na tela. Gravar ou reverter uma base não mexe nas outras, e
+# cada matrícula fica numa única origem por competência.
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS resultados (
+    competencia TEXT NOT NULL,
+    origem TEXT NOT NULL DEFAULT '',
+    matricula TEXT NOT NULL,
+    nome TEXT,
+    status TEXT,
+    valor_premio REAL,
+    detalhes TEXT,
+    observacoes TEXT,
+    status_calculado TEXT,
+    valor_calculado REAL,
+    editado INTEGER NOT NULL DEFAULT 0,
+    atualizado_em TEXT NOT NULL,
+    PRIMARY KEY (competencia, origem, matricula)
+);
+CREATE INDEX IF NOT EXISTS idx_resultados_matricula ON resultados (matricula, competencia);
+-- Cobre os totais por competência sem ler a tabela
+CREATE INDEX IF NOT EXISTS idx_resultados_competencia ON resultados (competencia, status, valor_premio, editado);
+"""
+
+def competencia_de(data):
+    """Competência AAAA-MM de uma data"""
+    return f"{data.year:04d}-{data.month:02d}"
+
+def _migrar(conexao):
+    # Bancos criados antes da coluna origem: as linhas existentes ficam com origem ''
+    colunas = [c[1] for c in conexao.execute("PRAGMA table_info(resultados)")]
+    if colunas and 'origem' not in colunas:
+        with conexao:
+            conexao.execute("DROP INDEX IF EXISTS idx_resultados_matricula")
+            conexao.execute("DROP INDEX IF EXISTS idx_resultados_competencia")
+            conexao.execute("ALTER TABLE resultados RENAME TO resultados_sem_origem")
+            conexao.executescript(_ESQUEMA)
+            conexao.execute("""
+                INSERT INTO resultados (competencia, matricula, nome, status, valor_premio, detalhes, observacoes,
+                                        status_calculado, valor_calculado, editado, atualizado_em)
+                SELECT competencia, matricula, nome, status, valor_premio, detalhes, observacoes,
+                       status_calculado, valor_calculado, editado, atualizado_em
+                FROM resultados_sem_origem
+            """)
+            conexao.execute("DROP TABLE resultados_sem_origem")
+
+def _conectar(caminho=None):
+    conexao = sqlite3.connect(caminho or CAMINHO_HISTORICO)
+    # WAL: consultas do histórico não esperam pela gravação de outra sessão
+    conexao.execute("PRAGMA journal_mode=WAL")
+    _migrar(conexao)
+    conexao.executescript(_ESQUEMA)
+    return conexao
+
+def _matricula(valor):
+    # 123, 123.0 e '123' são a mesma matrícula
+    try:
+        numero = float(valor)
+        if numero.is_integer():
+            return str(int(numero))
+    except (TypeError, ValueError):
+        pass
+    return str(valor).strip()
+
+def _coluna(df, nome):
+    if nome not in df.columns:
+        return [None] * len(df)
+    serie = df[nome]
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+def _linhas(df, competencia, origem, agora):
+    return list(zip(
+        [competencia] * len(df),
+        [origem] * len(df),
+        [_matricula(m) for m in df['Matricula']],
+        _coluna(df, 'Nome'),
+        _coluna(df, 'Status'),
+        _coluna(df, 'Valor_Premio'),
+        _coluna(df, 'Detalhes'),
+        _coluna(df, 'Observacoes'),
+        [agora] * len(df),
+    ))
+
+def _assumir_matriculas(conexao, competencia, origem, matriculas):
+    # A mesma matrícula gravada por outra origem na competência (a base reenviada com outro nome
+    # de unidade) passa para esta: sem isso o funcionário seria contado duas vezes. O cálculo
+    # antigo é descartado; a edição manual vem junto, a menos que esta origem já tenha a sua.
+    conexao.execute("CREATE TEMP TABLE IF NOT EXISTS entrada (matricula TEXT PRIMARY KEY)")
+    conexao.execute("DELETE FROM entrada")
+    conexao.executemany("INSERT OR IGNORE INTO entrada VALUES (?)", [(m,) for m in matriculas])
+    conexao.execute("""
+        DELETE FROM resultados
+        WHERE competencia = ?1 AND origem <> ?2 AND matricula IN (SELECT matricula FROM entrada)
+          AND (editado = 0 OR matricula IN (
+              SELECT matricula FROM resultados WHERE competencia = ?1 AND origem = ?2
+          ))
+    """, (competencia, origem))
+    conexao.execute("""
+        UPDATE OR REPLACE resultados SET origem = ?2
+        WHERE competencia = ?1 AND origem <> ?2 AND matricula IN (SELECT matricula FROM entrada)
+    """, (competencia, origem))
+
+def salvar_resultado(df_final, competencia, origem='', caminho=None):
+    """Grava o resultado calculado de uma base na competência, substituindo o cálculo anterior dela.
+
+    Linhas editadas manualmente mantêm a edição; só os valores calculados delas são atualizados.
+    Resultados de outras origens (outras unidades ou CNPJs) na mesma competência não são alterados,
+    exceto as matrículas presentes nesta base, que passam para esta origem.
+    """
+    agora = datetime.now().isoformat(timespec='seconds')
+    linhas = _linhas(df_final, competencia, origem, agora)
+    with closing(_conectar(caminho)) as conexao, conexao:
+        conexao.execute(
+            "DELETE FROM resultados WHERE competencia = ? AND origem = ? AND editado = 0", (competencia, origem)
+        )
+        _assumir_matriculas(conexao, competencia, origem, {linha[2] for linha in linhas})
+        conexao.executemany("""
+            INSERT INTO resultados (competencia, origem, matricula, nome, status, valor_premio, detalhes, observacoes,
+                                    atualizado_em, status_calculado, valor_calculado)
+            VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?8, ?9, ?5, ?6)
+            ON CONFLICT (competencia, origem, matricula) DO UPDATE SET
+                nome = excluded.nome,
+                detalhes = excluded.detalhes,
+                status_calculado = excluded.status_calculado,
+                valor_calculado = excluded.valor_calculado,
+                atualizado_em = excluded.atualizado_em
+        """, linhas)
+    return len(df_final)
+
+def salvar_edicoes(linhas, competencia, origem='', caminho=None):
+    """Grava as linhas editadas manualmente (Status, Valor_Premio e Observacoes) de uma base na competência"""
+    agora = datetime.now().isoformat(timespec='seconds')
+    with closing(_conectar(caminho)) as conexao, conexao:
+        conexao.executemany("""
+            INSERT INTO resultados (competencia, origem, matricula, nome, status, valor_premio, detalhes, observacoes,
+                                    atualizado_em, editado)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            ON CONFLICT (competencia, origem, matricula) DO UPDATE SET
+                status = excluded.status,
+                valor_premio = excluded.valor_premio,
+                observacoes = excluded.observacoes,
+                editado = 1,
+                atualizado_em = excluded.atualizado_em
+        """, _linhas(linhas, competencia, origem, agora))
+    return len(linhas)
+
+def reverter_edicoes(competencia, origem='', caminho=None):
+    """Volta as linhas editadas de uma base na competência aos valores calculados"""
+    with closing(_conectar(caminho)) as conexao, conexao:
+        conexao.execute("""
+            UPDATE resultados
+            SET status = status_calculado, valor_premio = valor_calculado, observacoes = NULL, editado = 0
+            WHERE competencia = ? AND origem = ? AND editado = 1 AND status_calculado IS NOT NULL
+        """, (competencia, origem))
+        conexao.execute(
+            "DELETE FROM resultados WHERE competencia = ? AND origem = ? AND editado = 1", (competencia, origem)
+        )
+
+def _consultar(sql, parametros=(), caminho=None):
+    with closing(_conectar(caminho)) as conexao:
+        return pd.read_sql_query(sql, conexao, params=parametros)
+
+def _periodo(inicio, fim):
+    filtros, parametros = [], []
+    if inicio:
+        filtros.append("competencia >= ?")
+        parametros.append(inicio)
+    if fim:
+        filtros.append("competencia <= ?")
+        parametros.append(fim)
+    return filtros, parametros
+
+def competencias(caminho=None):
+    """Competências gravadas, da mais recente para a mais antiga"""
+    return _consultar(
+        "SELECT DISTINCT competencia FROM resultados ORDER BY competencia DESC", caminho=caminho
+    )['competencia'].tolist()
+
+def historico_funcionario(matricula, inicio=None, fim=None, caminho=None):
+    """Status e prêmio de um funcionário em cada competência do período (AAAA-MM, inclusive)"""
+    filtros, parametros = _periodo(inicio, fim)
+    where = ' AND '.join(["matricula = ?"] + filtros)
+    return _consultar(f"""
+        SELECT competencia, origem, nome, status, valor_premio, detalhes, observacoes, editado
+        FROM resultados WHERE {where} ORDER BY competencia, origem
+    """, [_matricula(matricula)] + parametros, caminho)
+
+def totais_por_competencia(inicio=None, fim=None, caminho=None, por_origem=False):
+    """Funcionários, funcionários com direito e total pago em cada competência do período.
+
+    Com por_origem=True os totais saem por competência e origem (unidade); senão a coluna origem
+    lista as origens gravadas na competência.
+    """
+    filtros, parametros = _periodo(inicio, fim)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ''
+    grupo = 'competencia, origem' if por_origem else 'competencia'
+    origem = 'origem' if por_origem else "GROUP_CONCAT(DISTINCT origem) AS origem"
+    return _consultar(f"""
+        SELECT competencia, {origem},
+               COUNT(*) AS funcionarios,
+               SUM(status = 'Tem direito') AS com_direito,
+               SUM(editado) AS editados,
+               ROUND(SUM(COALESCE(valor_premio, 0)), 2) AS total_pago
+        FROM resultados {where}
+        GROUP BY {grupo} ORDER BY {grupo}
+    """, parametros, caminho)
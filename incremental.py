@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+def impressoes_digitais(df_aus):
+    """Hash de cada linha da base de ausências, sem as colunas derivadas (*_Normalizado)"""
+    colunas = [c for c in df_aus.columns if not str(c).endswith('_Normalizado')]
+    return pd.util.hash_pandas_object(df_aus[colunas], index=False).to_numpy()
+
+def matriculas_afetadas(aus_anterior, aus_nova):
+    """Matrículas com linhas incluídas, removidas ou alteradas entre dois envios da base de ausências"""
+    hashes_anteriores = impressoes_digitais(aus_anterior)
+    hashes_novos = impressoes_digitais(aus_nova)
+    # Diferença como multiconjunto: linhas repetidas contam uma vez cada
+    saldo = pd.concat([
+        pd.Series(-1, index=hashes_anteriores),
+        pd.Series(1, index=hashes_novos),
+    ]).groupby(level=0).sum()
+    alterados = saldo.index[saldo != 0].to_numpy()
+    return pd.unique(np.concatenate([
+        aus_anterior['Matricula'].to_numpy(dtype=object)[np.isin(hashes_anteriores, alterados)],
+        aus_nova['Matricula'].to_numpy(dtype=object)[np.isin(hashes_novos, alterados)],
+    ]))
+
+def comparar_resultados(df_anterior, df_novo, matriculas):
+    """Funcionários das matrículas informadas cujo Status ou Valor_Premio mudou"""
+    anterior = df_anterior[df_anterior['Matricula'].isin(matriculas)]
+    novo = df_novo.loc[anterior.index]
+    mudou = (anterior['Status'] != novo['Status']) | (anterior['Valor_Premio'] != novo['Valor_Premio'])
+    colunas = ['Matricula'] + (['Nome'] if 'Nome' in novo.columns else [])
+    mudancas = novo.loc[mudou, colunas].copy()
+    mudancas['Status_Anterior'] = anterior.loc[mudou, 'Status']
+    mudancas['Status_Atual'] = novo.loc[mudou, 'Status']
+    mudancas['Valor_Anterior'] = anterior.loc[mudou, 'Valor_Premio']
+    mudancas['Valor_Atual'] = novo.loc[mudou, 'Valor_Premio']
+    return mudancas.reset_index(drop=True)
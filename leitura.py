@@ -0,0 +1,204 @@
+import os
+import io
+import hashlib
+import pandas as pd
+import openpyxl
+from normalizacao import normalizar_serie
+from cache import CacheLRU
+from ausencias import IndiceAusencias
+from tipos_afastamento import TabelaTipos
+
+# Limite do cache de planilhas em memória (bytes)
+LIMITE_CACHE_PLANILHAS = 512 * 1024 * 1024
+# Diretório opcional para cópia colunar (Parquet) das planilhas já lidas
+DIRETORIO_CACHE = os.environ.get('ASSIDUIDADE_CACHE_DIR')
+
+# Muda quando o formato do DataFrame guardado muda, invalidando as cópias em disco antigas
+VERSAO_FORMATO = 3
+
+_cache_planilhas = CacheLRU(LIMITE_CACHE_PLANILHAS)
+
+# Linhas lidas por vez na leitura em streaming da base de ausências
+TAMANHO_LOTE_STREAMING = 50_000
+
+# Possíveis nomes das colunas da base de ausências
+COLUNAS_NOME = ['nome','nomefuncionario','nome_funcionario']
+COLUNAS_FALTA = ['falta','faltas','indicadorfalta','indicador','tipoafastamento']
+COLUNAS_DATA_AUSENCIA = ['data','dataafastamento','datainicio','datadeinicio','periodoinicial','datadoafastamento']
+
+def encontrar_coluna(df, possibilidades):
+    """Encontra uma coluna por possíveis nomes, num DataFrame ou numa lista de nomes"""
+    for nome in getattr(df, 'columns', df):
+        nome_limpo = nome.lower().replace(' ', '').replace('ç','c').replace('ã','a').replace('é','e').replace('í','i').replace('ê','e').replace('ó','o').replace('á','a').replace('ú','u')
+        if nome_limpo in possibilidades:
+            return nome
+    return None
+
+def conteudo_arquivo(arquivo):
+    """Bytes de um arquivo enviado pelo Streamlit, de um caminho ou de um objeto de arquivo"""
+    if isinstance(arquivo, (bytes, bytearray)):
+        return bytes(arquivo)
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, 'rb') as f:
+            return f.read()
+    if hasattr(arquivo, 'getvalue'):
+        return arquivo.getvalue()
+    posicao = arquivo.tell()
+    arquivo.seek(0)
+    conteudo = arquivo.read()
+    arquivo.seek(posicao)
+    return conteudo
+
+def hash_conteudo(arquivo):
+    return hashlib.sha256(conteudo_arquivo(arquivo)).hexdigest()
+
+def _caminho_disco(chave):
+    if not DIRETORIO_CACHE:
+        return None
+    nome = hashlib.sha256(repr(chave).encode('utf-8')).hexdigest()
+    return os.path.join(DIRETORIO_CACHE, f"{nome}.parquet")
+
+def _ler_disco(chave):
+    caminho = _caminho_disco(chave)
+    if not caminho or not os.path.exists(caminho):
+        return None
+    try:
+        return pd.read_parquet(caminho)
+    except Exception:
+        # Arquivo corrompido ou pyarrow indisponível: lê a planilha novamente
+        return None
+
+def _gravar_disco(chave, df):
+    caminho = _caminho_disco(chave)
+    if not caminho:
+        return
+    try:
+        os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        df.to_parquet(temporario, index=False)
+        os.replace(temporario, caminho)
+    except Exception:
+        # Colunas com tipos mistos ou pyarrow indisponível: fica só o cache em memória
+        pass
+
+def preparar_planilha(df, colunas_normalizadas=(), compactar=False):
+    """Padroniza uma planilha recém-lida: nomes de colunas, colunas normalizadas e tipos compactos"""
+    # Padroniza nomes de colunas
+    df.columns = [c.strip() for c in df.columns]
+    for coluna in colunas_normalizadas:
+        if coluna in df.columns:
+            df[f"{coluna}_Normalizado"] = normalizar_serie(df[coluna])
+    if compactar:
+        df = _compactar(df)
+    return df
+
+def ler_excel(arquivo, sheet_name=0, colunas_normalizadas=(), compactar=False):
+    """Lê a planilha com nomes de colunas sem espaços e colunas <coluna>_Normalizado já calculadas.
+
+    O resultado fica em cache pelo hash do conteúdo, aba e opções, então reabrir o mesmo
+    arquivo (ou o mesmo arquivo após reiniciar o servidor, com ASSIDUIDADE_CACHE_DIR) não
+    passa de novo pelo openpyxl. Com compactar=True a Matrícula vira int32 e os textos viram
+    categorias, que ocupam bem menos memória em bases com muitas linhas repetidas.
+    """
+    conteudo = conteudo_arquivo(arquivo)
+    chave = (hashlib.sha256(conteudo).hexdigest(), sheet_name, tuple(colunas_normalizadas), compactar, VERSAO_FORMATO)
+
+    def ler():
+        df = _ler_disco(chave)
+        if df is None:
+            df = preparar_planilha(pd.read_excel(io.BytesIO(conteudo), sheet_name=sheet_name),
+                                   colunas_normalizadas, compactar)
+            _gravar_disco(chave, df)
+        return df
+
+    # Sessões que abrem o mesmo arquivo ao mesmo tempo esperam uma única leitura
+    df = _cache_planilhas.obter_ou_calcular(chave, ler)
+    # Cópia rasa: quem chama pode criar ou substituir colunas sem alterar o cache
+    return df.copy(deep=False)
+
+def ler_tabela_tipos(arquivo):
+    """Lê e compila a Tabela de Tipos de Afastamentos (tipo de afastamento, Categoria e Peso)"""
+    return TabelaTipos(ler_excel(arquivo), chave=hash_conteudo(arquivo))
+
+def _valor_celula(valor):
+    # Mesma conversão do pd.read_excel: números inteiros gravados como decimal viram int
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+def _compactar(df):
+    if 'Matricula' in df.columns:
+        matricula = pd.to_numeric(df['Matricula'], errors='coerce')
+        inteira = matricula.notna().all() and (matricula % 1 == 0).all()
+        if inteira and matricula.between(-2**31, 2**31 - 1).all():
+            df['Matricula'] = matricula.astype('int32')
+    for coluna in df.columns:
+        if coluna != 'Matricula' and (df[coluna].dtype == object or pd.api.types.is_string_dtype(df[coluna])):
+            df[coluna] = df[coluna].astype('category')
+    return df
+
+def _processar_lote(linhas, colunas, retidas, agregados, tabela=None):
+    lote = _compactar(pd.DataFrame(linhas, columns=colunas))
+    lote['Afastamentos_Normalizado'] = normalizar_serie(lote['Afastamentos'])
+    indice = IndiceAusencias(lote, tabela=tabela)
+    # Só as linhas de férias e atraso são usadas nas abas da exportação; as demais entram apenas nos agregados
+    manter = indice.mascara('ferias') | indice.mascara('atraso')
+    retidas.append(lote[manter])
+    parcial = indice.agregados()
+    if agregados is None:
+        return parcial
+    return pd.concat([agregados, parcial]).groupby(level=0, sort=False).agg({
+        'Qtd_Atestados': 'sum',
+        'Tem_Atraso': 'any',
+        'Dias_Ferias': 'sum',
+        'Ferias_Decimal': 'any',
+    })
+
+def ler_ausencias_streaming(arquivo, tamanho_lote=TAMANHO_LOTE_STREAMING, tabela=None):
+    """Lê a base de ausências linha a linha, sem carregar a planilha inteira.
+
+    Devolve as linhas de férias e atraso (só com as colunas usadas no cálculo e na exportação,
+    em tipos compactos) e os agregados por Matrícula de todas as linhas, prontos para
+    IndiceAusencias(linhas, agregados=agregados, tabela=tabela).
+    """
+    conteudo = conteudo_arquivo(arquivo)
+    chave = (hashlib.sha256(conteudo).hexdigest(), 'streaming', tabela.chave if tabela else None, VERSAO_FORMATO)
+    retidas, agregados = _cache_planilhas.obter_ou_calcular(
+        chave, lambda: _ler_streaming(conteudo, tamanho_lote, tabela)
+    )
+    return retidas.copy(deep=False), agregados
+
+def _ler_streaming(conteudo, tamanho_lote, tabela):
+    livro = openpyxl.load_workbook(io.BytesIO(conteudo), read_only=True, data_only=True)
+    try:
+        linhas = livro.worksheets[0].iter_rows(values_only=True)
+        cabecalho = [
+            str(c).strip() if c is not None else f"Unnamed: {i}"
+            for i, c in enumerate(next(linhas, ()))
+        ]
+        if 'Matricula' not in cabecalho:
+            raise ValueError("Coluna 'Matricula' não encontrada na base de ausências.")
+        if 'Afastamentos' not in cabecalho:
+            raise ValueError("Coluna 'Afastamentos' não encontrada na base de ausências.")
+
+        # As duas primeiras colunas ficam para manter a coluna de dias de férias na segunda posição
+        desejadas = set(cabecalho[:2]) | {'Matricula', 'Afastamentos', 'Ausência Parcial'}
+        for possibilidades in (COLUNAS_NOME, COLUNAS_FALTA, COLUNAS_DATA_AUSENCIA):
+            desejadas.add(encontrar_coluna(cabecalho, possibilidades))
+        posicoes = [i for i, c in enumerate(cabecalho) if c in desejadas]
+        colunas = [cabecalho[i] for i in posicoes]
+
+        retidas, agregados, lote = [], None, []
+        for linha in linhas:
+            if all(v is None for v in linha):
+                continue
+            lote.append([_valor_celula(linha[i]) if i < len(linha) else None for i in posicoes])
+            if len(lote) >= tamanho_lote:
+                agregados = _processar_lote(lote, colunas, retidas, agregados, tabela)
+                lote = []
+        if lote or agregados is None:
+            agregados = _processar_lote(lote, colunas, retidas, agregados, tabela)
+    finally:
+        livro.close()
+
+    return _compactar(pd.concat(retidas, ignore_index=True)), agregados
@@ -0,0 +1,134 @@
+"""Processamento em lote, sem Streamlit, de vários pares de bases (um por mês ou por CNPJ).
+
+Exemplos:
+    python lote.py --par "EQUIPPE - Base Funcionarios.xlsx" "AUSENCIAS 1125.xlsx" --data-limite 2026-01-31 --saida relatorios
+    python lote.py --manifesto unidades.csv --saida relatorios --processos 8
+
+O manifesto é um CSV com as colunas funcionarios e ausencias e, opcionalmente, data_limite, nome
+(subpasta de saída) e tipos (Tabela de Tipos de Afastamentos). Cada par gera <saida>/<nome>/relatorio_executivo.xlsx
+e, com --relatorios-empresa html|pdf, um relatório por CNPJ em <saida>/<nome>/empresas/.
+"""
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from relatorio import carregar_bases, calcular_resultado, gerar_relatorio_executivo, funcionarios_com_direito
+from relatorio_html import gerar_relatorios_empresas
+
+NOME_RELATORIO = 'relatorio_executivo.xlsx'
+PASTA_EMPRESAS = 'empresas'
+
+def ler_data(texto):
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(texto.strip(), formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Data inválida: {texto} (use AAAA-MM-DD ou DD/MM/AAAA)")
+
+def processar_par(func_path, aus_path, data_limite, diretorio_saida, streaming=False, tipos_path=None,
+                  relatorios_empresa=None):
+    """Calcula os prêmios de um par de bases e grava o relatório executivo (e os relatórios por CNPJ)"""
+    df_func, df_aus, indice_aus = carregar_bases(func_path, aus_path, streaming=streaming, tipos_file=tipos_path)
+    resultado = calcular_resultado(df_func, df_aus, indice_aus, data_limite)
+    os.makedirs(diretorio_saida, exist_ok=True)
+    caminho = os.path.join(diretorio_saida, NOME_RELATORIO)
+    with open(caminho, 'wb') as f:
+        f.write(gerar_relatorio_executivo(resultado, data_limite))
+    if relatorios_empresa:
+        # Já roda dentro de um processo do lote: as empresas são geradas em sequência
+        gerar_relatorios_empresas(funcionarios_com_direito(resultado), os.path.join(diretorio_saida, PASTA_EMPRESAS),
+                                  formato=relatorios_empresa, processos=1)
+    return caminho, len(resultado.df_final)
+
+def executar_lote(tarefas, processos=None, streaming=False, relatorios_empresa=None):
+    """Executa as tarefas em paralelo, um processo por par de bases.
+
+    Cada tarefa é um dict com funcionarios, ausencias, data_limite, saida e tipos. Devolve, na ordem
+    das tarefas, dicts com saida, caminho, funcionarios e erro (None quando deu certo).
+    """
+    resultados = [None] * len(tarefas)
+
+    def registrar(i, futuro_ou_funcao):
+        tarefa = tarefas[i]
+        try:
+            caminho, qtd = futuro_ou_funcao()
+            resultados[i] = {'saida': tarefa['saida'], 'caminho': caminho, 'funcionarios': qtd, 'erro': None}
+        except Exception as e:
+            resultados[i] = {'saida': tarefa['saida'], 'caminho': None, 'funcionarios': 0, 'erro': str(e)}
+
+    def argumentos(tarefa):
+        return (tarefa['funcionarios'], tarefa['ausencias'], tarefa['data_limite'], tarefa['saida'],
+                streaming, tarefa.get('tipos'), relatorios_empresa)
+
+    if processos == 1 or len(tarefas) <= 1:
+        for i, tarefa in enumerate(tarefas):
+            registrar(i, lambda: processar_par(*argumentos(tarefa)))
+        return resultados
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = {executor.submit(processar_par, *argumentos(t)): i for i, t in enumerate(tarefas)}
+        for futuro in as_completed(futuros):
+            registrar(futuros[futuro], futuro.result)
+    return resultados
+
+def montar_tarefas(pares, manifesto, data_limite, diretorio_saida, tipos=None):
+    entradas = [{'funcionarios': f, 'ausencias': a} for f, a in pares or []]
+    if manifesto:
+        with open(manifesto, newline='', encoding='utf-8-sig') as f:
+            dialeto = csv.Sniffer().sniff(f.read(4096), delimiters=',;')
+            f.seek(0)
+            entradas.extend(csv.DictReader(f, dialect=dialeto))
+
+    tarefas, nomes_usados = [], set()
+    for entrada in entradas:
+        nome = (entrada.get('nome') or '').strip()
+        if not nome:
+            nome = os.path.splitext(os.path.basename(entrada['ausencias']))[0]
+        # Mesmo nome de arquivo de ausências em pastas diferentes: sufixo numérico
+        base, n = nome, 2
+        while nome in nomes_usados:
+            nome, n = f"{base}_{n}", n + 1
+        nomes_usados.add(nome)
+        data = entrada.get('data_limite')
+        tarefas.append({
+            'funcionarios': entrada['funcionarios'],
+            'ausencias': entrada['ausencias'],
+            'data_limite': ler_data(data) if data else data_limite,
+            'saida': os.path.join(diretorio_saida, nome),
+            'tipos': (entrada.get('tipos') or '').strip() or tipos,
+        })
+    return tarefas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cálculo de prêmio de assiduidade em lote")
+    parser.add_argument('--par', nargs=2, action='append', metavar=('FUNCIONARIOS', 'AUSENCIAS'),
+                        help="Par de planilhas (base de funcionários e base de ausências); pode repetir")
+    parser.add_argument('--manifesto', help="CSV com as colunas funcionarios, ausencias[, data_limite, nome]")
+    parser.add_argument('--data-limite', type=ler_data, default=datetime.now().date(),
+                        help="Data limite de admissão (padrão: hoje)")
+    parser.add_argument('--saida', default='relatorios', help="Diretório de saída (padrão: relatorios)")
+    parser.add_argument('--processos', type=int, default=None, help="Número de processos (padrão: núcleos da máquina)")
+    parser.add_argument('--streaming', action='store_true', help="Leitura em streaming das bases de ausências")
+    parser.add_argument('--tipos', help="Tabela de Tipos de Afastamentos usada quando o manifesto não indica outra")
+    parser.add_argument('--relatorios-empresa', choices=['html', 'pdf'],
+                        help="Gera também um relatório por CNPJ com os funcionários com direito (pdf requer pdfkit)")
+    args = parser.parse_args(argv)
+    if not args.par and not args.manifesto:
+        parser.error("informe ao menos um --par ou um --manifesto")
+
+    tarefas = montar_tarefas(args.par, args.manifesto, args.data_limite, args.saida, tipos=args.tipos)
+    falhas = 0
+    for r in executar_lote(tarefas, processos=args.processos, streaming=args.streaming,
+                           relatorios_empresa=args.relatorios_empresa):
+        if r['erro']:
+            falhas += 1
+            print(f"ERRO  {r['saida']}: {r['erro']}", file=sys.stderr)
+        else:
+            print(f"OK    {r['caminho']} ({r['funcionarios']} funcionários)")
+    return 1 if falhas else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,30 @@
+import unicodedata
+from functools import lru_cache
+import pandas as pd
+
+@lru_cache(maxsize=100_000)
+def _normalizar_str(texto):
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = texto.encode('ASCII', 'ignore').decode('ASCII')
+    return texto.lower().strip()
+
+def normalizar_texto(valor):
+    if pd.isna(valor):
+        return ''
+    return _normalizar_str(str(valor))
+
+def normalizar_serie(serie):
+    """Normaliza só os valores distintos da coluna e devolve uma Series categórica.
+
+    Os códigos (serie.cat.codes) apontam para os textos normalizados em serie.cat.categories;
+    valores ausentes viram texto vazio, como em normalizar_texto.
+    """
+    codigos, unicos = pd.factorize(serie)
+    # O texto vazio fica por último: o código -1 dos valores ausentes aponta para ele
+    normalizados = pd.Index([normalizar_texto(v) for v in unicos] + [''], dtype=object)
+    codigos_normalizados, categorias = pd.factorize(normalizados)
+    return pd.Series(
+        pd.Categorical.from_codes(codigos_normalizados[codigos], categories=categorias),
+        index=serie.index,
+        name=serie.name
+    )
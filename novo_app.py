@@ -1,8 +1,12 @@
+import os
+import sqlite3
 import streamlit as st
-import pandas as pd
-import io
 from datetime import datetime
-import unicodedata
+from relatorio import obter_resultado, gerar_relatorio_executivo, mudancas_desde, ABAS_EXECUTIVO
+from utils import editar_valores_status, enviar_exportacao, sessao_exportacao
+from diagnostico import Diagnostico, coletar, perfilar, ferramentas_perfil
+from fila_exportacao import fila, CONCLUIDA, ERRO
+import historico
 
 st.set_page_config(page_title="Cálculo de Prêmio - Nova Lógica", layout="wide")
 st.title("Sistema de Cálculo de Prêmio - Nova Lógica")
@@ -12,281 +16,182 @@ st.sidebar.header("Importação de Dados")
 # Uploads
 func_file = st.sidebar.file_uploader("Base de Funcionários", type=["xlsx"])
 aus_file = st.sidebar.file_uploader("Base de Ausências", type=["xlsx"])
-tipo_file = st.sidebar.file_uploader("Tipos de Afastamento (opcional)", type=["xlsx"])
+tipo_file = st.sidebar.file_uploader(
+    "Tipos de Afastamento (opcional)", type=["xlsx"],
+    help="Tabela de Tipos de Afastamentos (coluna 'tipo de afastamento' e, opcionalmente, 'Categoria' "
+         "com atraso, atestado, ferias ou outro e 'Peso'). Tipos fora da tabela são classificados pelo nome."
+)
 
 data_limite = st.sidebar.date_input("Data Limite de Admissão", value=datetime.now())
-
-def normalizar_texto(valor):
-    if pd.isna(valor):
-        return ''
-    texto = unicodedata.normalize('NFKD', str(valor))
-    texto = texto.encode('ASCII', 'ignore').decode('ASCII')
-    return texto.lower().strip()
-
-# Função para cálculo do prêmio considerando atestados
-def calcular_premio(row, ausencias):
-    VALOR_BASE = 315.00
-    SALARIO_LIMITE = 2720.86
-    horas = row['horas']
-    salario = row['salario']
-    status = "Tem direito"
-    valor = VALOR_BASE
-    detalhes = []
-    # Filtra ausências do funcionário
-    aus = ausencias[ausencias['Matricula'] == row['Matricula']].copy()
-    if 'Afastamentos_Normalizado' in aus.columns:
-        aus['Afastamento_Normalizado'] = aus['Afastamentos_Normalizado']
-    else:
-        aus['Afastamento_Normalizado'] = aus['Afastamentos'].apply(normalizar_texto)
-    if aus.shape[1] > 1:
-        aus['Status_Normalizado'] = aus.iloc[:,1].apply(normalizar_texto)
-    else:
-        aus['Status_Normalizado'] = ''
-
-
-    # 1. Se houver "Atraso" ou "Férias" na coluna de afastamentos, aplicar lógica especial
-    if aus['Afastamento_Normalizado'].str.contains('atraso').any():
-        return pd.Series({
-            'Valor_Premio': 0,
-            'Status': 'Aguardando decisão',
-            'Detalhes': 'Afastamento: Atraso',
-            'Qtd_Atestados': aus['Afastamento_Normalizado'].str.contains('atestado').sum()
-        })
-
-    # Conta atestados
-    dias_atestado = aus['Afastamento_Normalizado'].str.contains('atestado').sum()
-
-    # 2. Férias: descontar dias proporcionalmente se houver "Férias" na coluna
-    dias_ferias = 0
-    mask_ferias = aus['Afastamento_Normalizado'].str.contains('ferias')
-    if mask_ferias.any():
-        # Tenta extrair quantidade de dias da coluna de status, se for número
-        try:
-            dias_ferias = pd.to_numeric(aus.loc[mask_ferias, 'Status_Normalizado'], errors='coerce').sum()
-        except Exception:
-            dias_ferias = 0
-
-    # Regras de cálculo padrão
-    if salario > SALARIO_LIMITE:
-        status = "Não tem direito"
-        valor = 0
-        detalhes.append("Salário acima do limite")
-    elif dias_atestado >= 3:
-        status = "Não tem direito"
-        valor = 0
-        detalhes.append(f"{dias_atestado} dias de atestado (perde o direito)")
-    elif dias_atestado == 2:
-        valor = VALOR_BASE * 0.25
-        detalhes.append("2 dias de atestado (25% do valor)")
-    elif dias_atestado == 1:
-        valor = VALOR_BASE * 0.5
-        detalhes.append("1 dia de atestado (50% do valor)")
-    # Jornada 4h
-    if horas <= 120 and valor > 0:
-        valor = round(valor * 0.5, 2)
-        detalhes.append("Jornada 4h (50%)")
-    # Desconto proporcional de férias
-    if dias_ferias > 0 and valor > 0:
-        desconto = min(dias_ferias / 30, 1)
-        valor = round(valor * (1 - desconto), 2)
-        detalhes.append(f"Desconto férias: {dias_ferias} dias")
-    return pd.Series({
-        'Valor_Premio': valor,
-        'Status': status,
-        'Detalhes': "; ".join(detalhes),
-        'Qtd_Atestados': dias_atestado
-    })
+modo_streaming = st.sidebar.checkbox(
+    "Leitura em streaming da base de ausências",
+    help="Para bases de ausências muito grandes: lê a planilha linha a linha e mantém só as colunas e linhas usadas no relatório."
+)
+modo_incremental = st.sidebar.checkbox(
+    "Recálculo incremental",
+    value=True,
+    help="Ao reenviar a base de ausências, recalcula só os funcionários cujas ausências mudaram."
+)
+modo_historico = st.sidebar.checkbox(
+    "Gravar no histórico",
+    help="Guarda os resultados e as edições manuais por competência (mês da data limite) e base de funcionários "
+         "num banco local, para consultas entre meses."
+)
+unidade_historico = st.sidebar.text_input(
+    "Unidade no histórico",
+    help="Nome da unidade ou CNPJ da base de funcionários. Reenviar a base corrigida com o mesmo nome "
+         "substitui o resultado gravado na competência."
+).strip() if modo_historico else ''
+modo_diagnostico = st.sidebar.checkbox(
+    "Diagnóstico",
+    help="Mede tempo, linhas de entrada e saída e variação de memória de cada etapa do processamento e da exportação."
+)
+ferramenta_perfil = None
+if modo_diagnostico:
+    ferramenta = st.sidebar.selectbox("Perfilador", ferramentas_perfil(), key="ferramenta_perfil")
+    if st.sidebar.button("Perfilar esta execução", help="Roda o processamento uma vez com o perfilador ligado."):
+        ferramenta_perfil = ferramenta
 
 # Processamento principal
 def processar():
     if not (func_file and aus_file):
         st.warning("Carregue as bases de funcionários e ausências.")
         return
-    df_func = pd.read_excel(func_file)
-    df_aus = pd.read_excel(aus_file)
-    # Padroniza nomes de colunas
-    df_func.columns = [c.strip() for c in df_func.columns]
-    df_aus.columns = [c.strip() for c in df_aus.columns]
-    # Garante colunas essenciais
-    if 'Matricula' not in df_func.columns:
-        st.error("Coluna 'Matricula' não encontrada na base de funcionários.")
-        return
-    if 'Afastamentos' not in df_aus.columns:
-        st.error("Coluna 'Afastamentos' não encontrada na base de ausências.")
+    # Resultado em cache pelas bases, data limite e versão das regras: botões não recalculam tudo
+    anterior = st.session_state.get('ultimo_resultado') if modo_incremental else None
+    try:
+        resultado = obter_resultado(
+            func_file, aus_file, data_limite, streaming=modo_streaming, anterior=anterior, tipos_file=tipo_file
+        )
+    except ValueError as e:
+        st.error(str(e))
         return
-    df_aus['Afastamentos_Normalizado'] = df_aus['Afastamentos'].fillna('').apply(normalizar_texto)
-    # Função para encontrar colunas por possíveis nomes
-    def encontrar_coluna(df, possibilidades):
-        for nome in df.columns:
-            nome_limpo = nome.lower().replace(' ', '').replace('ç','c').replace('ã','a').replace('é','e').replace('í','i').replace('ê','e').replace('ó','o').replace('á','a').replace('ú','u')
-            if nome_limpo in possibilidades:
-                return nome
-        return None
-
-    col_data_adm = encontrar_coluna(df_func, ['datadeadmissao','dataadmissao','admissao'])
-    col_horas = encontrar_coluna(df_func, ['qtdhorasmensais','horasmensais','horas','qtdhoras'])
-    col_salario = encontrar_coluna(df_func, ['salariomesatual','salariomesatu','salariomes','salario','saláriomesatual','saláriomesatu','saláriomes'])
-    col_falta_aus = encontrar_coluna(df_aus, ['falta','faltas','indicadorfalta','indicador','tipoafastamento'])
-
-    if not col_data_adm:
-        st.error("Coluna de data de admissão não encontrada na base de funcionários.")
-        return
-    if not col_horas:
-        st.error("Coluna de horas mensais não encontrada na base de funcionários.")
-        return
-    if not col_salario:
-        st.error("Coluna de salário não encontrada na base de funcionários.")
-        return
-
-    ferias_mask_base = df_aus['Afastamentos_Normalizado'].str.contains('ferias', na=False)
-    if col_falta_aus:
-        ferias_mask_base = ferias_mask_base & df_aus[col_falta_aus].astype(str).str.strip().str.upper().eq('F')
-    ferias_aus_all = df_aus[ferias_mask_base].copy()
-    ferias_matriculas = ferias_aus_all['Matricula'].unique()
-
-    # Filtra por data de admissão
-    df_func[col_data_adm] = pd.to_datetime(df_func[col_data_adm], errors='coerce', dayfirst=True)
-    df_func = df_func[df_func[col_data_adm] <= pd.to_datetime(data_limite)]
-
-    # Aplica cálculo, passando horas e salário explicitamente
-    resultado = df_func.apply(
-        lambda row: calcular_premio(
-            pd.Series({
-                **row,
-                'horas': row[col_horas],
-                'salario': row[col_salario]
-            }),
-            df_aus
-        ),
-        axis=1
-    )
-    df_final = pd.concat([df_func, resultado], axis=1)
-    if ferias_matriculas.size > 0:
-        mask_ferias_func = df_final['Matricula'].isin(ferias_matriculas)
-        if mask_ferias_func.any():
-            detalhe_msg = 'Em férias - calcular à parte'
-            df_final.loc[mask_ferias_func, 'Status'] = 'Férias'
-            df_final.loc[mask_ferias_func, 'Valor_Premio'] = 0
-            detalhes_atual = df_final.loc[mask_ferias_func, 'Detalhes'].fillna('').astype(str)
-            df_final.loc[mask_ferias_func, 'Detalhes'] = detalhes_atual.apply(
-                lambda txt: detalhe_msg if txt.strip() == '' else f"{txt}; {detalhe_msg}"
-            )
+    st.session_state.ultimo_resultado = resultado
+    df_final = resultado.df_final
+    # Edições manuais valem só para o resultado em que foram feitas
+    if st.session_state.get('chave_resultado') != resultado.chave:
+        st.session_state.chave_resultado = resultado.chave
+        st.session_state.pop('modified_df', None)
+        # Diferença para o envio anterior desta sessão; o resultado em cache é compartilhado entre sessões
+        st.session_state.mudancas = mudancas_desde(anterior, resultado)
+    # Origem: a unidade informada, e não o arquivo: a base corrigida substitui a anterior
+    chave_historico = (resultado.chave, unidade_historico)
+    if modo_historico and st.session_state.get('chave_historico') != chave_historico:
+        competencia = historico.competencia_de(data_limite)
+        origem = unidade_historico
+        try:
+            historico.salvar_resultado(df_final, competencia, origem)
+            st.session_state.chave_historico = chave_historico
+            st.session_state.competencia_historico = competencia
+            st.session_state.origem_historico = origem
+        except sqlite3.Error as e:
+            st.warning(f"Não foi possível gravar no histórico: {e}")
+    elif not modo_historico:
+        st.session_state.pop('chave_historico', None)
+        st.session_state.pop('competencia_historico', None)
+        st.session_state.pop('origem_historico', None)
+    if st.session_state.get('mudancas') is not None:
+        mudancas, recalculados = st.session_state.mudancas
+        st.info(
+            f"Recálculo incremental: {recalculados} funcionário(s) recalculado(s), "
+            f"{len(mudancas)} com status ou valor alterado desde o envio anterior."
+        )
+        if not mudancas.empty:
+            st.dataframe(mudancas)
     st.subheader("Relatório de Prêmios Calculados")
     st.dataframe(df_final)
-    # Exportação Excel com abas separadas e lógica aprimorada
-    if st.button("Exportar Relatório Executivo Excel"):
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            col_nome = encontrar_coluna(df_func, ['nome','nomefuncionario','nome_funcionario']) or 'Nome'
-            col_nome_aus = encontrar_coluna(df_aus, ['nome','nomefuncionario','nome_funcionario'])
-            col_data_aus = encontrar_coluna(df_aus, ['data','dataafastamento','datainicio','datadeinicio','periodoinicial','datadoafastamento'])
-
-            ferias_aus = ferias_aus_all.copy()
-            if col_data_aus and not ferias_aus.empty:
-                ferias_aus[col_data_aus] = pd.to_datetime(ferias_aus[col_data_aus], errors='coerce', dayfirst=True)
-                ferias_aus_mes = ferias_aus[
-                    (ferias_aus[col_data_aus].dt.month == data_limite.month) &
-                    (ferias_aus[col_data_aus].dt.year == data_limite.year)
-                ].copy()
-            else:
-                ferias_aus_mes = ferias_aus.copy()
-            def resumir_dias(series):
-                datas_validas = sorted({d.date() for d in series.dropna()})
-                if not datas_validas:
-                    return pd.Series({'Dias_Ferias_Mes': '', 'Qtd_Dias_Ferias_Mes': 0})
-                return pd.Series({
-                    'Dias_Ferias_Mes': ", ".join([d.strftime('%d/%m') for d in datas_validas]),
-                    'Qtd_Dias_Ferias_Mes': len(datas_validas)
-                })
-
-            if not ferias_aus_mes.empty:
-                group_cols = ['Matricula']
-                if col_nome_aus:
-                    group_cols.append(col_nome_aus)
-                if col_data_aus:
-                    dias_resumo = ferias_aus_mes.groupby(group_cols)[col_data_aus].apply(resumir_dias).reset_index()
-                else:
-                    dias_resumo = ferias_aus_mes.groupby(group_cols).size().reset_index(name='Qtd_Dias_Ferias_Mes')
-                    dias_resumo['Dias_Ferias_Mes'] = ''
-                    dias_resumo = dias_resumo[group_cols + ['Dias_Ferias_Mes','Qtd_Dias_Ferias_Mes']]
-                if col_nome_aus and col_nome_aus != col_nome:
-                    dias_resumo.rename(columns={col_nome_aus: col_nome}, inplace=True)
-            else:
-                base_cols = ['Matricula', col_nome] if col_nome else ['Matricula']
-                dias_resumo = pd.DataFrame(columns=base_cols + ['Dias_Ferias_Mes','Qtd_Dias_Ferias_Mes'])
-
-            df_ferias = df_final[df_final['Matricula'].isin(ferias_matriculas)].copy()
-            df_ferias['Dias_Ferias_Mes'] = ''
-            df_ferias['Qtd_Dias_Ferias_Mes'] = 0
-            if not dias_resumo.empty and not df_ferias.empty:
-                merge_cols = ['Matricula']
-                if col_nome and col_nome in df_ferias.columns and col_nome in dias_resumo.columns:
-                    merge_cols.append(col_nome)
-                df_ferias = df_ferias.merge(dias_resumo, on=merge_cols, how='left', suffixes=('', '_Resumo'))
-                df_ferias['Dias_Ferias_Mes'] = df_ferias['Dias_Ferias_Mes_Resumo'].fillna('')
-                df_ferias['Qtd_Dias_Ferias_Mes'] = df_ferias['Qtd_Dias_Ferias_Mes_Resumo'].fillna(0).astype(int)
-                df_ferias.drop(columns=['Dias_Ferias_Mes_Resumo','Qtd_Dias_Ferias_Mes_Resumo'], inplace=True)
-            if df_ferias.empty:
-                df_ferias = pd.DataFrame(columns=list(df_final.columns) + ['Dias_Ferias_Mes','Qtd_Dias_Ferias_Mes'])
-
-            df_ferias_detalhado = ferias_aus_mes.copy()
-            if not df_ferias_detalhado.empty:
-                if col_data_aus:
-                    df_ferias_detalhado['Dia_Mes'] = df_ferias_detalhado[col_data_aus].dt.strftime('%d/%m/%Y')
-                else:
-                    df_ferias_detalhado['Dia_Mes'] = ''
+    if 'Nome' in df_final.columns and st.checkbox("Editar valores e status manualmente"):
+        editar_valores_status(df_final)
+    # Exportação Excel com abas separadas e lógica aprimorada; só as abas escolhidas são montadas
+    abas = st.multiselect(
+        "Abas do relatório executivo", list(ABAS_EXECUTIVO), default=list(ABAS_EXECUTIVO), key="abas_executivo",
+        help="Só a folha de pagamento? Deixe apenas 'Tem Direito': as abas de férias e atrasos não são calculadas."
+    )
+    # Gerado em segundo plano: a tela continua respondendo e o arquivo fica no painel de exportações
+    if st.button("Exportar Relatório Executivo Excel", disabled=not abas):
+        enviar_exportacao(
+            "Excel Executivo", "relatorio_executivo.xlsx",
+            lambda tarefa: gerar_relatorio_executivo(resultado, data_limite, abas=abas, progresso=tarefa.avancar),
+            chave=('executivo', resultado.chave, str(data_limite), tuple(abas)),
+        )
+
+def lista_exportacoes(em_andamento):
+    tarefas = fila.tarefas(sessao_exportacao())
+    # Terminou tudo: roda a página de novo para parar a atualização automática
+    if em_andamento and all(t.terminada for t in tarefas):
+        st.rerun()
+    for tarefa in reversed(tarefas):
+        with st.container(border=True):
+            col_info, col_acao = st.columns([4, 1])
+            col_info.write(f"**{tarefa.descricao}** ({tarefa.criada_em:%H:%M:%S}): {tarefa.estado}")
+            if tarefa.estado == CONCLUIDA:
+                col_info.caption(f"Gerado em {tarefa.tempo_s}s")
+                for aviso in tarefa.avisos:
+                    col_info.warning(aviso)
+                col_acao.download_button(
+                    f"Baixar {tarefa.descricao}", tarefa.conteudo, tarefa.nome_arquivo,
+                    key=f"baixar_{tarefa.id}", on_click="ignore"
+                )
+            elif tarefa.estado == ERRO:
+                col_info.error(f"Erro ao exportar: {tarefa.erro}")
             else:
-                df_ferias_detalhado = pd.DataFrame(columns=list(ferias_aus.columns) + ['Dia_Mes'])
-
-            # Remove quem está de férias de todas as outras abas
-            filtro_nao_ferias = ~df_final['Matricula'].isin(ferias_matriculas)
-            df_direito = df_final[(df_final['Status'] == 'Tem direito') & filtro_nao_ferias]
-            df_nao_direito = df_final[(df_final['Status'] == 'Não tem direito') & filtro_nao_ferias]
-
-            # Aba Atrasos: todos com status "Aguardando decisão" OU afastamento de atraso
-            atrasos_matriculas = df_aus[df_aus['Afastamentos'].str.lower().str.contains('atraso', na=False)]['Matricula'].unique()
-            df_atrasos = df_final[df_final['Matricula'].isin(atrasos_matriculas) | (df_final['Status'] == 'Aguardando decisão')]
-            if not df_atrasos.empty:
-                df_atrasos = df_atrasos[filtro_nao_ferias]
-
-            # Soma do tempo de atraso por funcionário (adiciona coluna se possível)
-            if 'Ausência Parcial' in df_aus.columns and not df_atrasos.empty:
-                atrasos = df_aus[df_aus['Afastamentos'].str.lower().str.contains('atraso', na=False)]
-                def soma_tempo(series):
-                    total_min = 0
-                    for t in series:
-                        if pd.isna(t):
-                            continue
-                        partes = str(t).replace('-', '').split(':')
-                        if len(partes) == 2 and partes[0].isdigit() and partes[1].isdigit():
-                            total_min += int(partes[0])*60 + int(partes[1])
-                    horas = total_min // 60
-                    minutos = total_min % 60
-                    return f"{horas:02d}:{minutos:02d}"
-                df_soma = atrasos.groupby(['Matricula', col_nome])['Ausência Parcial'].apply(soma_tempo).reset_index()
-                df_soma.rename(columns={'Ausência Parcial': 'Total Atraso'}, inplace=True)
-                df_atrasos = pd.merge(df_atrasos, df_soma, on=['Matricula', col_nome], how='left')
-
-            abas = [
-                ('Tem Direito', df_direito),
-                ('Não Tem Direito', df_nao_direito),
-                ('Férias', df_ferias),
-                ('Férias Detalhado', df_ferias_detalhado),
-                ('Atrasos', df_atrasos)
-            ]
-            pelo_menos_uma = False
-            for nome_aba, df_aba in abas:
-                if not df_aba.empty:
-                    df_aba.to_excel(writer, index=False, sheet_name=nome_aba)
-                    pelo_menos_uma = True
-                else:
-                    # Cria aba com cabeçalho e uma linha dummy se não houver dados
-                    if isinstance(df_aba, pd.DataFrame) and len(df_aba.columns) > 0:
-                        dummy = {col: 'Sem dados disponíveis' for col in df_aba.columns}
-                        pd.DataFrame([dummy]).to_excel(writer, index=False, sheet_name=nome_aba)
-            # Se nenhuma aba teve dados, cria uma aba dummy
-            if not pelo_menos_uma:
-                pd.DataFrame({'Sem dados': ['Sem dados disponíveis']}).to_excel(writer, index=False, sheet_name='Sem Dados')
-        st.download_button("Baixar Excel Executivo", output.getvalue(), "relatorio_executivo.xlsx")
+                col_info.progress(tarefa.progresso, text=tarefa.mensagem or tarefa.estado)
+            if tarefa.terminada and col_acao.button("Descartar", key=f"descartar_{tarefa.id}"):
+                fila.remover(tarefa.id)
+                st.rerun()
+
+def painel_exportacoes():
+    tarefas = fila.tarefas(sessao_exportacao())
+    if not tarefas:
+        return
+    st.subheader("Exportações")
+    # Com exportações em andamento, só o painel é atualizado a cada segundo
+    em_andamento = not all(t.terminada for t in tarefas)
+    st.fragment(lista_exportacoes, run_every=1 if em_andamento else None)(em_andamento)
 
-processar()
+def painel_historico():
+    if not os.path.exists(historico.CAMINHO_HISTORICO):
+        return
+    with st.expander("Histórico de competências"):
+        totais = historico.totais_por_competencia()
+        if totais.empty:
+            st.info("Nenhuma competência gravada.")
+            return
+        st.dataframe(totais, hide_index=True)
+        st.bar_chart(totais.set_index('competencia')['total_pago'])
+        matricula = st.text_input("Histórico do funcionário (Matrícula)", key="historico_matricula")
+        if matricula:
+            st.dataframe(historico.historico_funcionario(matricula), hide_index=True)
+
+def painel_diagnostico():
+    diagnostico = st.session_state.diagnostico
+    st.sidebar.subheader("Diagnóstico")
+    tabela = diagnostico.tabela()
+    st.sidebar.dataframe(tabela, hide_index=True)
+    if not tabela.empty:
+        st.sidebar.caption(f"Execução de {diagnostico.execucao}")
+    st.sidebar.download_button(
+        "Baixar log das etapas (JSON Lines)", diagnostico.log(), "diagnostico.jsonl", mime="application/jsonl"
+    )
+    perfil = st.session_state.get('perfil')
+    if perfil:
+        with st.sidebar.expander(f"Perfil ({perfil['ferramenta']})"):
+            st.code(perfil['texto'])
+        st.sidebar.download_button("Baixar perfil", perfil['texto'], "perfil.txt")
+
+if modo_diagnostico:
+    if 'diagnostico' not in st.session_state:
+        st.session_state.diagnostico = Diagnostico()
+    with coletar(st.session_state.diagnostico):
+        if ferramenta_perfil:
+            with perfilar(ferramenta_perfil) as perfil:
+                processar()
+            st.session_state.perfil = perfil
+        else:
+            processar()
+    painel_diagnostico()
+else:
+    processar()
+painel_exportacoes()
+if modo_historico:
+    painel_historico()
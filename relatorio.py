@@ -0,0 +1,388 @@
+from dataclasses import dataclass
+from functools import cached_property
+import numpy as np
+import pandas as pd
+from calculo import calcular_premios, PARAMETROS_REGRAS
+from exportacao import escrever_excel
+from ausencias import IndiceAusencias
+from cache import CacheLRU, tamanho_em_bytes
+from diagnostico import etapa
+from incremental import matriculas_afetadas, comparar_resultados
+from leitura import ler_excel, ler_ausencias_streaming, ler_tabela_tipos, hash_conteudo, encontrar_coluna, COLUNAS_NOME, COLUNAS_FALTA, COLUNAS_DATA_AUSENCIA
+
+# Limite do cache de resultados calculados em memória (bytes)
+LIMITE_CACHE_RESULTADOS = 256 * 1024 * 1024
+
+_cache_resultados = CacheLRU(LIMITE_CACHE_RESULTADOS)
+
+# Limite do cache das abas do relatório executivo já montadas (bytes)
+LIMITE_CACHE_ABAS = 128 * 1024 * 1024
+
+_cache_abas = CacheLRU(LIMITE_CACHE_ABAS)
+
+@dataclass
+class Resultado:
+    """Saída da etapa de cálculo, usada na exibição e na exportação"""
+    df_final: pd.DataFrame
+    df_func: pd.DataFrame
+    df_aus: pd.DataFrame
+    indice_aus: IndiceAusencias
+    ferias_aus_all: pd.DataFrame
+    ferias_matriculas: np.ndarray
+    # Chave do cache de resultados (hashes das bases, data limite e versão das regras)
+    chave: tuple = None
+
+def carregar_bases(func_file, aus_file, streaming=False, tipos_file=None):
+    """Lê as bases de funcionários e ausências e monta o índice das ausências.
+
+    Com a Tabela de Tipos de Afastamentos (tipos_file), os afastamentos são classificados por ela.
+    """
+    # Leitura com cache pelo conteúdo do arquivo: colunas padronizadas e afastamentos já normalizados
+    with etapa('leitura_funcionarios') as registro:
+        df_func = ler_excel(func_file)
+        registro['saida'] = df_func
+    # Garante colunas essenciais
+    if 'Matricula' not in df_func.columns:
+        raise ValueError("Coluna 'Matricula' não encontrada na base de funcionários.")
+    tabela = None
+    if tipos_file is not None:
+        with etapa('tabela_tipos') as registro:
+            tabela = ler_tabela_tipos(tipos_file)
+            registro['saida'] = len(tabela)
+    # Índice único das ausências, usado pelo cálculo e por todas as abas da exportação
+    if streaming:
+        with etapa('leitura_ausencias') as registro:
+            df_aus, agregados_aus = ler_ausencias_streaming(aus_file, tabela=tabela)
+            registro.update(saida=df_aus, detalhe='streaming')
+        with etapa('indice_ausencias', df_aus) as registro:
+            indice_aus = IndiceAusencias(df_aus, agregados=agregados_aus, tabela=tabela)
+            registro['saida'] = indice_aus.matriculas
+    else:
+        with etapa('leitura_ausencias') as registro:
+            df_aus = ler_excel(aus_file, colunas_normalizadas=['Afastamentos'], compactar=True)
+            registro['saida'] = df_aus
+        if 'Afastamentos' not in df_aus.columns:
+            raise ValueError("Coluna 'Afastamentos' não encontrada na base de ausências.")
+        with etapa('indice_ausencias', df_aus) as registro:
+            indice_aus = IndiceAusencias(df_aus, tabela=tabela)
+            registro['saida'] = indice_aus.matriculas
+    # Datas convertidas uma vez aqui, não a cada aba exportada
+    col_data_aus = encontrar_coluna(df_aus, COLUNAS_DATA_AUSENCIA)
+    if col_data_aus:
+        df_aus[col_data_aus] = pd.to_datetime(df_aus[col_data_aus], errors='coerce', dayfirst=True)
+    return df_func, df_aus, indice_aus
+
+def selecionar_ferias(df_aus, indice_aus):
+    """Linhas de férias (com falta 'F', quando a coluna existe) e as matrículas correspondentes"""
+    col_falta_aus = encontrar_coluna(df_aus, COLUNAS_FALTA)
+    ferias_mask_base = indice_aus.mascara('ferias')
+    if col_falta_aus:
+        ferias_mask_base = ferias_mask_base & df_aus[col_falta_aus].astype(str).str.strip().str.upper().eq('F').to_numpy()
+    ferias_aus_all = df_aus[ferias_mask_base]
+    return ferias_aus_all, ferias_aus_all['Matricula'].unique()
+
+def calcular_resultado(df_func, df_aus, indice_aus, data_limite):
+    col_data_adm = encontrar_coluna(df_func, ['datadeadmissao','dataadmissao','admissao'])
+    col_horas = encontrar_coluna(df_func, ['qtdhorasmensais','horasmensais','horas','qtdhoras'])
+    col_salario = encontrar_coluna(df_func, ['salariomesatual','salariomesatu','salariomes','salario','saláriomesatual','saláriomesatu','saláriomes'])
+
+    if not col_data_adm:
+        raise ValueError("Coluna de data de admissão não encontrada na base de funcionários.")
+    if not col_horas:
+        raise ValueError("Coluna de horas mensais não encontrada na base de funcionários.")
+    if not col_salario:
+        raise ValueError("Coluna de salário não encontrada na base de funcionários.")
+
+    with etapa('selecao_ferias', df_aus) as registro:
+        ferias_aus_all, ferias_matriculas = selecionar_ferias(df_aus, indice_aus)
+        registro['saida'] = ferias_aus_all
+
+    with etapa('calculo_premios', df_func) as registro:
+        # Filtra por data de admissão, sem alterar o DataFrame recebido
+        datas_adm = pd.to_datetime(df_func[col_data_adm], errors='coerce', dayfirst=True)
+        admitidos = datas_adm <= pd.to_datetime(data_limite)
+        df_func = df_func[admitidos].assign(**{col_data_adm: datas_adm[admitidos]})
+
+        # Calcula todos os prêmios de uma vez a partir dos agregados por Matrícula
+        resultado = calcular_premios(df_func, indice_aus.agregados(), col_horas, col_salario)
+        df_final = pd.concat([df_func, resultado], axis=1)
+        if ferias_matriculas.size > 0:
+            mask_ferias_func = df_final['Matricula'].isin(ferias_matriculas)
+            if mask_ferias_func.any():
+                detalhe_msg = 'Em férias - calcular à parte'
+                df_final.loc[mask_ferias_func, 'Status'] = 'Férias'
+                df_final.loc[mask_ferias_func, 'Valor_Premio'] = 0
+                detalhes_atual = df_final.loc[mask_ferias_func, 'Detalhes'].fillna('').astype(str)
+                df_final.loc[mask_ferias_func, 'Detalhes'] = np.where(
+                    detalhes_atual.str.strip() == '', detalhe_msg, detalhes_atual + '; ' + detalhe_msg
+                )
+        registro['saida'] = df_final
+    return Resultado(df_final, df_func, df_aus, indice_aus, ferias_aus_all, ferias_matriculas)
+
+def recalcular_incremental(anterior, df_aus, indice_aus, data_limite):
+    """Atualiza o resultado anterior recalculando só as matrículas cujas ausências mudaram.
+
+    Vale quando só a base de ausências mudou (mesma base de funcionários e data limite).
+    """
+    with etapa('diferenca_ausencias', df_aus) as registro:
+        afetadas = matriculas_afetadas(anterior.df_aus, df_aus)
+        registro.update(saida=afetadas, detalhe='matrículas afetadas')
+    func_afetados = anterior.df_func[anterior.df_func['Matricula'].isin(afetadas)]
+    aus_afetadas = df_aus[df_aus['Matricula'].isin(afetadas)]
+    parcial = calcular_resultado(func_afetados, aus_afetadas, IndiceAusencias(aus_afetadas, tabela=indice_aus.tabela), data_limite)
+
+    # Substitui as linhas recalculadas mantendo a ordem original dos funcionários
+    df_final = pd.concat([
+        anterior.df_final.drop(index=parcial.df_final.index),
+        parcial.df_final,
+    ]).reindex(anterior.df_final.index)
+    ferias_aus_all, ferias_matriculas = selecionar_ferias(df_aus, indice_aus)
+    return Resultado(df_final, anterior.df_func, df_aus, indice_aus, ferias_aus_all, ferias_matriculas)
+
+def _permite_incremental(anterior, chave, df_aus):
+    # Mesma base de funcionários, data limite, regras e tabela de tipos, leitura completa e mesmas colunas de ausências
+    return (
+        anterior is not None and anterior.chave is not None
+        and not chave[3]
+        and anterior.chave[0] == chave[0] and anterior.chave[2:] == chave[2:]
+        and list(anterior.df_aus.columns) == list(df_aus.columns)
+    )
+
+def mudancas_desde(anterior, resultado):
+    """Diferença entre o resultado anterior de uma sessão e o atual.
+
+    Devolve (funcionários com status ou valor alterado, funcionários recalculados), ou None quando
+    o anterior não é comparável (outra base de funcionários, data limite, regras ou tabela de tipos).
+    Fica fora do Resultado porque ele é compartilhado entre sessões pelo cache.
+    """
+    if anterior is None or anterior.chave == resultado.chave or not _permite_incremental(anterior, resultado.chave, resultado.df_aus):
+        return None
+    afetadas = matriculas_afetadas(anterior.df_aus, resultado.df_aus)
+    recalculados = int(resultado.df_final['Matricula'].isin(afetadas).sum())
+    return comparar_resultados(anterior.df_final, resultado.df_final, afetadas), recalculados
+
+def chave_resultado(func_file, aus_file, data_limite, streaming=False, tipos_file=None):
+    return (
+        hash_conteudo(func_file), hash_conteudo(aus_file), str(data_limite), bool(streaming), PARAMETROS_REGRAS,
+        hash_conteudo(tipos_file) if tipos_file is not None else None,
+    )
+
+def _tamanho_resultado(resultado):
+    return tamanho_em_bytes([resultado.df_final, resultado.df_func, resultado.df_aus, resultado.ferias_aus_all])
+
+def obter_resultado(func_file, aus_file, data_limite, streaming=False, anterior=None, tipos_file=None):
+    """Mesmo que carregar_bases + calcular_resultado, reaproveitando o resultado já calculado.
+
+    Com um resultado anterior da mesma base de funcionários e data limite, só os funcionários
+    cujas ausências mudaram são recalculados. Os DataFrames do resultado são compartilhados
+    entre execuções e sessões e não devem ser alterados.
+    """
+    with etapa('obter_resultado') as registro:
+        chave = chave_resultado(func_file, aus_file, data_limite, streaming, tipos_file)
+        registro['detalhe'] = 'cache'
+
+        def calcular():
+            df_func, df_aus, indice_aus = carregar_bases(func_file, aus_file, streaming=streaming, tipos_file=tipos_file)
+            if _permite_incremental(anterior, chave, df_aus):
+                resultado = recalcular_incremental(anterior, df_aus, indice_aus, data_limite)
+                registro['detalhe'] = 'incremental'
+            else:
+                resultado = calcular_resultado(df_func, df_aus, indice_aus, data_limite)
+                registro['detalhe'] = 'completo'
+            resultado.chave = chave
+            return resultado
+
+        # O cache é do processo: sessões que pedem o mesmo resultado ao mesmo tempo esperam um único cálculo
+        resultado = _cache_resultados.obter_ou_calcular(chave, calcular, tamanho=_tamanho_resultado)
+        registro['saida'] = resultado.df_final
+    return resultado
+
+def minutos_atraso(serie):
+    """Converte uma coluna de durações "HH:MM" em minutos; vazios e valores inválidos contam 0"""
+    presentes = np.flatnonzero(serie.notna().to_numpy())
+    # O sinal '-' é ignorado e só valem duas partes numéricas separadas por ':'
+    texto = pd.Series(serie.to_numpy(dtype=object)[presentes]).astype(str).str.replace('-', '', regex=False)
+    partes = texto.str.extract(r'^(\d+):(\d+)\Z')
+    validos = partes[0].notna().to_numpy()
+    minutos = np.zeros(len(serie), dtype='int64')
+    minutos[presentes[validos]] = (
+        partes.loc[validos, 0].astype('int64') * 60 + partes.loc[validos, 1].astype('int64')
+    ).to_numpy()
+    return minutos
+
+def formatar_minutos(minutos):
+    """Minutos totais no formato HH:MM"""
+    horas = (minutos // 60).astype('int64').astype(str).str.zfill(2)
+    resto = (minutos % 60).astype('int64').astype(str).str.zfill(2)
+    return horas + ':' + resto
+
+def funcionarios_com_direito(resultado):
+    """Funcionários da aba Tem Direito: status Tem direito e sem férias no mês"""
+    df_final = resultado.df_final
+    return df_final[(df_final['Status'] == 'Tem direito') & ~df_final['Matricula'].isin(resultado.ferias_matriculas)]
+
+class _BaseAbas:
+    """Dados comuns às abas do relatório executivo, calculados só quando alguma aba os usa"""
+
+    def __init__(self, resultado, data_limite):
+        self.resultado = resultado
+        self.data_limite = data_limite
+        self.df_final = resultado.df_final
+        self.col_nome = encontrar_coluna(resultado.df_func, COLUNAS_NOME) or 'Nome'
+        self.col_nome_aus = encontrar_coluna(resultado.df_aus, COLUNAS_NOME)
+        self.col_data_aus = encontrar_coluna(resultado.df_aus, COLUNAS_DATA_AUSENCIA)
+
+    @cached_property
+    def filtro_nao_ferias(self):
+        # Quem está de férias sai de todas as outras abas
+        return ~self.df_final['Matricula'].isin(self.resultado.ferias_matriculas)
+
+    @cached_property
+    def ferias_aus_mes(self):
+        ferias_aus = self.resultado.ferias_aus_all
+        col_data_aus = self.col_data_aus
+        if col_data_aus and not ferias_aus.empty:
+            datas = pd.to_datetime(ferias_aus[col_data_aus], errors='coerce', dayfirst=True)
+            no_mes = (datas.dt.month == self.data_limite.month) & (datas.dt.year == self.data_limite.year)
+            return ferias_aus[no_mes].assign(**{col_data_aus: datas[no_mes]})
+        return ferias_aus
+
+# As abas são filtros das bases já calculadas; colunas novas entram com assign, sem cópias completas
+
+def _aba_tem_direito(base):
+    return funcionarios_com_direito(base.resultado)
+
+def _aba_nao_tem_direito(base):
+    df_final = base.df_final
+    return df_final[(df_final['Status'] == 'Não tem direito') & base.filtro_nao_ferias]
+
+def _aba_ferias(base):
+    df_final = base.df_final
+    col_nome, col_nome_aus, col_data_aus = base.col_nome, base.col_nome_aus, base.col_data_aus
+    ferias_aus_mes = base.ferias_aus_mes
+    def resumir_dias(series):
+        datas_validas = sorted({d.date() for d in series.dropna()})
+        if not datas_validas:
+            return pd.Series({'Dias_Ferias_Mes': '', 'Qtd_Dias_Ferias_Mes': 0})
+        return pd.Series({
+            'Dias_Ferias_Mes': ", ".join([d.strftime('%d/%m') for d in datas_validas]),
+            'Qtd_Dias_Ferias_Mes': len(datas_validas)
+        })
+
+    if not ferias_aus_mes.empty:
+        group_cols = ['Matricula']
+        if col_nome_aus:
+            group_cols.append(col_nome_aus)
+        if col_data_aus:
+            dias_resumo = ferias_aus_mes.groupby(group_cols, observed=True)[col_data_aus].apply(resumir_dias).reset_index()
+        else:
+            dias_resumo = ferias_aus_mes.groupby(group_cols, observed=True).size().reset_index(name='Qtd_Dias_Ferias_Mes')
+            dias_resumo['Dias_Ferias_Mes'] = ''
+            dias_resumo = dias_resumo[group_cols + ['Dias_Ferias_Mes','Qtd_Dias_Ferias_Mes']]
+        if col_nome_aus and col_nome_aus != col_nome:
+            dias_resumo.rename(columns={col_nome_aus: col_nome}, inplace=True)
+    else:
+        base_cols = ['Matricula', col_nome] if col_nome else ['Matricula']
+        dias_resumo = pd.DataFrame(columns=base_cols + ['Dias_Ferias_Mes','Qtd_Dias_Ferias_Mes'])
+
+    df_ferias = df_final[~base.filtro_nao_ferias].assign(Dias_Ferias_Mes='', Qtd_Dias_Ferias_Mes=0)
+    if not dias_resumo.empty and not df_ferias.empty:
+        merge_cols = ['Matricula']
+        if col_nome and col_nome in df_ferias.columns and col_nome in dias_resumo.columns:
+            merge_cols.append(col_nome)
+        df_ferias = df_ferias.merge(dias_resumo, on=merge_cols, how='left', suffixes=('', '_Resumo'))
+        df_ferias['Dias_Ferias_Mes'] = df_ferias['Dias_Ferias_Mes_Resumo'].fillna('')
+        df_ferias['Qtd_Dias_Ferias_Mes'] = df_ferias['Qtd_Dias_Ferias_Mes_Resumo'].fillna(0).astype(int)
+        df_ferias.drop(columns=['Dias_Ferias_Mes_Resumo','Qtd_Dias_Ferias_Mes_Resumo'], inplace=True)
+    if df_ferias.empty:
+        df_ferias = pd.DataFrame(columns=list(df_final.columns) + ['Dias_Ferias_Mes','Qtd_Dias_Ferias_Mes'])
+    return df_ferias
+
+def _aba_ferias_detalhado(base):
+    df_ferias_detalhado = base.ferias_aus_mes
+    if df_ferias_detalhado.empty:
+        return pd.DataFrame(columns=list(base.resultado.ferias_aus_all.columns) + ['Dia_Mes'])
+    if base.col_data_aus:
+        return df_ferias_detalhado.assign(Dia_Mes=df_ferias_detalhado[base.col_data_aus].dt.strftime('%d/%m/%Y'))
+    return df_ferias_detalhado.assign(Dia_Mes='')
+
+def _aba_atrasos(base):
+    df_final = base.df_final
+    df_aus = base.resultado.df_aus
+    indice_aus = base.resultado.indice_aus
+    col_nome = base.col_nome
+
+    # Todos com status "Aguardando decisão" OU afastamento de atraso
+    atrasos_matriculas = indice_aus.matriculas_com('atraso')
+    df_atrasos = df_final[df_final['Matricula'].isin(atrasos_matriculas) | (df_final['Status'] == 'Aguardando decisão')]
+    if not df_atrasos.empty:
+        df_atrasos = df_atrasos[base.filtro_nao_ferias]
+
+    # Soma do tempo de atraso por funcionário (adiciona coluna se possível)
+    if 'Ausência Parcial' in df_aus.columns and not df_atrasos.empty:
+        atrasos = df_aus[indice_aus.mascara('atraso')]
+        df_soma = atrasos[['Matricula', col_nome]].assign(**{'Minutos Atraso': minutos_atraso(atrasos['Ausência Parcial'])})
+        df_soma = df_soma.groupby(['Matricula', col_nome], observed=True)['Minutos Atraso'].sum().reset_index()
+        # Formatado só na saída; a coluna numérica fica para ordenações e limites
+        df_soma.insert(2, 'Total Atraso', formatar_minutos(df_soma['Minutos Atraso']))
+        df_atrasos = pd.merge(df_atrasos, df_soma, on=['Matricula', col_nome], how='left')
+        df_atrasos['Minutos Atraso'] = df_atrasos['Minutos Atraso'].astype('Int64')
+    return df_atrasos
+
+# Abas do relatório executivo, na ordem da planilha; cada uma é montada só quando selecionada
+ABAS_EXECUTIVO = {
+    'Tem Direito': _aba_tem_direito,
+    'Não Tem Direito': _aba_nao_tem_direito,
+    'Férias': _aba_ferias,
+    'Férias Detalhado': _aba_ferias_detalhado,
+    'Atrasos': _aba_atrasos,
+}
+
+def _montar_aba(nome_aba, base):
+    # Abas de resultados em cache (obter_resultado) ficam em cache pela chave do resultado
+    chave = (base.resultado.chave, str(base.data_limite), nome_aba) if base.resultado.chave else None
+    df_aba = _cache_abas.obter(chave) if chave else None
+    if df_aba is None:
+        with etapa(f'aba_{nome_aba}', base.df_final) as registro:
+            df_aba = ABAS_EXECUTIVO[nome_aba](base)
+            registro['saida'] = df_aba
+        if chave:
+            _cache_abas.guardar(chave, df_aba)
+    return df_aba
+
+def abas_relatorio_executivo(resultado, data_limite, abas=None, progresso=None):
+    """Abas [(nome, DataFrame), ...] do relatório executivo, prontas para escrever_excel.
+
+    abas limita a saída às abas indicadas (nomes de ABAS_EXECUTIVO); as demais não são calculadas.
+    progresso(fração, mensagem), quando informado, é chamado a cada aba montada.
+    """
+    base = _BaseAbas(resultado, data_limite)
+    selecionadas = [nome for nome in ABAS_EXECUTIVO if abas is None or nome in abas]
+    pelo_menos_uma = False
+    abas_saida = []
+    for i, nome_aba in enumerate(selecionadas):
+        df_aba = _montar_aba(nome_aba, base)
+        if progresso:
+            # A gravação do Excel fica com a última parte da barra
+            progresso(0.7 * (i + 1) / len(selecionadas), f"Aba {nome_aba} montada")
+        if not df_aba.empty:
+            abas_saida.append((nome_aba, df_aba))
+            pelo_menos_uma = True
+        else:
+            # Cria aba com cabeçalho e uma linha dummy se não houver dados
+            if isinstance(df_aba, pd.DataFrame) and len(df_aba.columns) > 0:
+                dummy = {col: 'Sem dados disponíveis' for col in df_aba.columns}
+                abas_saida.append((nome_aba, pd.DataFrame([dummy])))
+    # Se nenhuma aba teve dados, cria uma aba dummy
+    if not pelo_menos_uma:
+        abas_saida.append(('Sem Dados', pd.DataFrame({'Sem dados': ['Sem dados disponíveis']})))
+    return abas_saida
+
+def gerar_relatorio_executivo(resultado, data_limite, backend=None, abas=None, progresso=None):
+    """Relatório executivo em Excel com abas separadas e lógica aprimorada (só as abas indicadas, se houver)"""
+    with etapa('abas_executivo', resultado.df_final) as registro:
+        abas = abas_relatorio_executivo(resultado, data_limite, abas=abas, progresso=progresso)
+        registro['saida'] = sum(len(df) for _, df in abas)
+    if progresso:
+        progresso(0.7, 'Gravando o Excel')
+    return escrever_excel(abas, backend=backend)
@@ -0,0 +1,125 @@
+import html
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+import pandas as pd
+from leitura import encontrar_coluna
+
+CAMINHO_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'report_template.html')
+LINHAS_POR_PAGINA = 40
+
+COLUNAS_CPF = ['cpf', 'cpffuncionario', 'numerocpf']
+COLUNAS_CNPJ = ['cnpj', 'cnpjempresa', 'cnpjdaempresa', 'cnpjfilial']
+
+_LINHA = "            <tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>\n"
+_TITULO_PAGINA = '    <h2 style="color: #555; font-size: 16px;">CNPJ {} &mdash; página {} de {}</h2>\n'
+_QUEBRA_PAGINA = '    <div style="page-break-after: always;"></div>\n'
+
+@lru_cache(maxsize=4)
+def compilar_template(caminho=CAMINHO_TEMPLATE):
+    """Divide o template em cabeçalho, abertura e fechamento da tabela e rodapé, uma única vez"""
+    with open(caminho, encoding='utf-8') as f:
+        texto = f.read()
+    inicio_tabela = texto.index('<table>')
+    inicio_linhas = texto.index('<tbody>') + len('<tbody>')
+    fim_linhas = texto.index('</tbody>')
+    fim_tabela = texto.index('</table>') + len('</table>')
+    return (
+        texto[:inicio_tabela],
+        texto[inicio_tabela:inicio_linhas] + '\n',
+        '        ' + texto[fim_linhas:fim_tabela] + '\n',
+        texto[fim_tabela:],
+    )
+
+def formatar_moeda(valor):
+    texto = f"{valor:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+    return f"R$ {texto}"
+
+def nome_arquivo(cnpj):
+    return f"relatorio_{re.sub(r'[^0-9A-Za-z]+', '_', str(cnpj)).strip('_') or 'sem_cnpj'}"
+
+def _texto(serie):
+    return serie.where(serie.notna(), '').astype(str)
+
+def _documento(serie, digitos):
+    """CPF ou CNPJ como texto; os lidos como número (1234567890.0) voltam com os zeros à esquerda"""
+    texto = _texto(serie.astype(object)).str.strip().str.replace(r'^(\d+)\.0*$', r'\1', regex=True)
+    return texto.where(~texto.str.fullmatch(r'\d+'), texto.str.zfill(digitos))
+
+def somar_por_funcionario(df):
+    """Linhas do relatório (CPF, Nome, Soma de Valor, CNPJ), com o prêmio somado por funcionário e CNPJ"""
+    col_cpf = encontrar_coluna(df, COLUNAS_CPF)
+    col_cnpj = encontrar_coluna(df, COLUNAS_CNPJ)
+    cpf = _documento(df[col_cpf], 11) if col_cpf else pd.Series('', index=df.index)
+    # Sem CPF (coluna ausente ou vazia) o funcionário é identificado pela Matrícula: só CPFs
+    # repetidos de fato são somados
+    chave = ('cpf:' + cpf).where(cpf != '', 'matricula:' + _texto(df['Matricula']))
+    linhas = pd.DataFrame({
+        'CPF': cpf,
+        'Chave': chave,
+        'Nome': df['Nome'] if 'Nome' in df.columns else '',
+        'Valor': pd.to_numeric(df['Valor_Premio'], errors='coerce').fillna(0),
+        'CNPJ': _documento(df[col_cnpj], 14) if col_cnpj else '',
+    })
+    return (
+        linhas.groupby(['CNPJ', 'Chave'], sort=False, dropna=False)
+        .agg(CPF=('CPF', 'first'), Nome=('Nome', 'first'), Valor=('Valor', 'sum'))
+        .reset_index()
+        .sort_values(['CNPJ', 'Nome'], kind='stable')
+    )
+
+def escrever_relatorio(linhas, cnpj, caminho, linhas_por_pagina=LINHAS_POR_PAGINA, template=CAMINHO_TEMPLATE):
+    """Grava o relatório HTML de um CNPJ, página a página, sem montar o documento inteiro em memória"""
+    cabecalho, abre_tabela, fecha_tabela, rodape = compilar_template(template)
+    rodape = rodape.replace(
+        '<span id="data-relatorio"></span>',
+        f'<span id="data-relatorio">{datetime.now():%d/%m/%Y}</span>'
+    )
+    cnpj_html = html.escape(cnpj or 'não informado')
+    paginas = max(1, -(-len(linhas) // linhas_por_pagina))
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write(cabecalho)
+        for pagina in range(paginas):
+            if pagina:
+                f.write(_QUEBRA_PAGINA)
+            f.write(_TITULO_PAGINA.format(cnpj_html, pagina + 1, paginas))
+            f.write(abre_tabela)
+            trecho = linhas.iloc[pagina * linhas_por_pagina:(pagina + 1) * linhas_por_pagina]
+            f.writelines(
+                _LINHA.format(html.escape(cpf), html.escape(str(nome)), formatar_moeda(valor), cnpj_html)
+                for cpf, nome, valor in zip(trecho['CPF'], trecho['Nome'], trecho['Valor'])
+            )
+            f.write(fecha_tabela)
+        f.write(rodape)
+    return caminho
+
+def _gerar_empresa(linhas, cnpj, diretorio, formato, linhas_por_pagina):
+    caminho_html = os.path.join(diretorio, nome_arquivo(cnpj) + '.html')
+    escrever_relatorio(linhas, cnpj, caminho_html, linhas_por_pagina)
+    if formato != 'pdf':
+        return caminho_html
+    try:
+        import pdfkit
+    except ImportError:
+        raise RuntimeError("Geração de PDF requer o pacote pdfkit (e o programa wkhtmltopdf).")
+    caminho_pdf = os.path.splitext(caminho_html)[0] + '.pdf'
+    pdfkit.from_file(caminho_html, caminho_pdf, options={'quiet': ''})
+    os.remove(caminho_html)
+    return caminho_pdf
+
+def gerar_relatorios_empresas(df_direito, diretorio, formato='html', processos=None,
+                              linhas_por_pagina=LINHAS_POR_PAGINA):
+    """Gera um relatório por CNPJ com os funcionários com direito e devolve os caminhos gravados.
+
+    Os arquivos são gerados em paralelo, um processo por empresa (processos=1 gera em sequência).
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    linhas = somar_por_funcionario(df_direito)
+    grupos = [(grupo, cnpj) for cnpj, grupo in linhas.groupby('CNPJ', sort=True)]
+    argumentos = [(grupo, cnpj, diretorio, formato, linhas_por_pagina) for grupo, cnpj in grupos]
+    if processos == 1 or len(argumentos) <= 1:
+        return [_gerar_empresa(*a) for a in argumentos]
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        return list(executor.map(_gerar_empresa, *zip(*argumentos)))
@@ -0,0 +1,49 @@
+"""Confere minutos_atraso e formatar_minutos contra a soma de tempo por grupo usada antes da vetorização."""
+import os
+import sys
+from datetime import time
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from relatorio import formatar_minutos, minutos_atraso
+
+def soma_tempo(series):
+    """Soma original, valor a valor: referência para minutos_atraso + formatar_minutos"""
+    total_min = 0
+    for t in series:
+        if pd.isna(t):
+            continue
+        partes = str(t).replace('-', '').split(':')
+        if len(partes) == 2 and partes[0].isdigit() and partes[1].isdigit():
+            total_min += int(partes[0])*60 + int(partes[1])
+    horas = total_min // 60
+    minutos = total_min % 60
+    return f"{horas:02d}:{minutos:02d}"
+
+VALORES = [
+    '00:15', '01:30', '-00:10', '0:5', '120:45', '08:00\n', ' 00:20', '00:20 ', '00:-30', '1:2:3', '10',
+    '', 'abc', 'ab:cd', ':30', '00:', '٠١:٣٠', 15, 1.5, time(0, 15), np.nan, None,
+]
+
+def test_valores_isolados():
+    serie = pd.Series(VALORES, dtype=object)
+    minutos = pd.Series(minutos_atraso(serie))
+    assert formatar_minutos(minutos).tolist() == [soma_tempo([v]) for v in VALORES]
+
+@pytest.mark.parametrize('semente', range(50))
+def test_soma_por_funcionario(semente):
+    rng = np.random.default_rng(semente)
+    n = int(rng.integers(1, 200))
+    atrasos = pd.DataFrame({
+        'Matricula': rng.integers(0, 20, n),
+        'Ausência Parcial': rng.choice(np.array(VALORES, dtype=object), n),
+    })
+    if semente % 5 == 0:
+        # Coluna sem nenhum valor: o Excel a entrega como float64
+        atrasos['Ausência Parcial'] = np.nan
+
+    esperado = atrasos.groupby('Matricula')['Ausência Parcial'].apply(soma_tempo)
+    minutos = atrasos.assign(Minutos=minutos_atraso(atrasos['Ausência Parcial'])).groupby('Matricula')['Minutos'].sum()
+    assert formatar_minutos(minutos).tolist() == esperado.tolist()
@@ -0,0 +1,95 @@
+import os
+import sys
+import threading
+import time
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache import CacheLRU
+
+N_THREADS = 8
+
+class Interrompido(BaseException):
+    """Como a interrupção do Streamlit quando a sessão recarrega a página"""
+
+def em_paralelo(cache, calcular, n=N_THREADS):
+    """Chama obter_ou_calcular em n threads ao mesmo tempo e devolve (valor ou exceção) de cada uma"""
+    juntas = threading.Barrier(n)
+    saidas = [None] * n
+
+    def chamar(i):
+        juntas.wait(timeout=10)
+        try:
+            saidas[i] = cache.obter_ou_calcular('chave', calcular)
+        except BaseException as e:
+            saidas[i] = e
+
+    threads = [threading.Thread(target=chamar, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    assert not any(t.is_alive() for t in threads)
+    return saidas
+
+def calculo_lento(resultados):
+    """calcular() que demora o bastante para as outras threads chegarem e conta as chamadas"""
+    chamadas = []
+
+    def calcular():
+        chamadas.append(threading.get_ident())
+        time.sleep(0.2)
+        resultado = resultados[min(len(chamadas), len(resultados)) - 1]
+        if isinstance(resultado, BaseException):
+            raise resultado
+        return resultado
+
+    return calcular, chamadas
+
+def test_chamadas_simultaneas_calculam_uma_vez():
+    cache = CacheLRU(1024 * 1024)
+    valor = {'resultado': [1, 2, 3]}
+    calcular, chamadas = calculo_lento([valor])
+    saidas = em_paralelo(cache, calcular)
+    assert len(chamadas) == 1
+    assert all(s is valor for s in saidas)
+    assert cache.obter('chave') is valor
+    assert cache._em_calculo == {}
+
+def test_excecao_chega_a_todos_e_nao_fica_em_cache():
+    cache = CacheLRU(1024 * 1024)
+    erro = ValueError('planilha inválida')
+    calcular, chamadas = calculo_lento([erro, 'ok'])
+    saidas = em_paralelo(cache, calcular)
+    assert len(chamadas) == 1
+    assert all(s is erro for s in saidas)
+    assert 'chave' not in cache and cache._em_calculo == {}
+    # A próxima chamada calcula de novo
+    assert cache.obter_ou_calcular('chave', calcular) == 'ok'
+    assert len(chamadas) == 2
+
+def test_interrupcao_de_quem_calcula_passa_o_calculo_adiante():
+    cache = CacheLRU(1024 * 1024)
+    valor = object()
+    calcular, chamadas = calculo_lento([Interrompido(), valor])
+    saidas = em_paralelo(cache, calcular)
+    # Só quem foi interrompido recebe a interrupção; uma das que esperavam calcula para as demais
+    assert len(chamadas) == 2
+    assert sum(isinstance(s, Interrompido) for s in saidas) == 1
+    assert sum(s is valor for s in saidas) == N_THREADS - 1
+    assert cache.obter('chave') is valor
+    assert cache._em_calculo == {}
+
+@pytest.mark.parametrize('tamanho', [2048, lambda valor: 2048])
+def test_valor_maior_que_o_limite_nao_e_guardado(tamanho):
+    cache = CacheLRU(1024)
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        return b'x'
+
+    assert cache.obter_ou_calcular('chave', calcular, tamanho=tamanho) == b'x'
+    assert 'chave' not in cache and cache.total_bytes == 0
+    cache.obter_ou_calcular('chave', calcular, tamanho=tamanho)
+    assert len(chamadas) == 2
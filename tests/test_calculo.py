@@ -0,0 +1,207 @@
+"""Confere calcular_premios contra as regras aplicadas linha a linha, como eram antes da vetorização.
+
+Uso:
+    python -m pytest -q tests
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from ausencias import IndiceAusencias
+from calculo import SALARIO_LIMITE, VALOR_BASE, calcular_premios
+from leitura import preparar_planilha
+from normalizacao import normalizar_texto
+
+COL_HORAS = 'Qtd Horas Mensais'
+COL_SALARIO = 'Salário Mês Atual'
+COLUNAS_RESULTADO = ['Valor_Premio', 'Status', 'Detalhes', 'Qtd_Atestados']
+
+def calcular_premio(row, ausencias):
+    """Regras originais, um funcionário por vez: referência para o cálculo vetorizado"""
+    aus = ausencias[ausencias['Matricula'] == row['Matricula']].copy()
+    if 'Afastamentos_Normalizado' in aus.columns:
+        aus['Afastamento_Normalizado'] = aus['Afastamentos_Normalizado']
+    else:
+        aus['Afastamento_Normalizado'] = aus['Afastamentos'].apply(normalizar_texto)
+    aus['Status_Normalizado'] = aus.iloc[:, 1].apply(normalizar_texto)
+
+    if aus['Afastamento_Normalizado'].str.contains('atraso', na=False).any():
+        return pd.Series({
+            'Valor_Premio': 0,
+            'Status': 'Aguardando decisão',
+            'Detalhes': 'Afastamento: Atraso',
+            'Qtd_Atestados': aus['Afastamento_Normalizado'].str.contains('atestado', na=False).sum()
+        })
+
+    dias_atestado = aus['Afastamento_Normalizado'].str.contains('atestado', na=False).sum()
+    dias_ferias = pd.to_numeric(
+        aus.loc[aus['Afastamento_Normalizado'].str.contains('ferias', na=False), 'Status_Normalizado'],
+        errors='coerce'
+    ).sum()
+
+    valor = VALOR_BASE
+    status = 'Tem direito'
+    detalhes = []
+    if row['salario'] > SALARIO_LIMITE:
+        status = 'Não tem direito'
+        valor = 0
+        detalhes.append("Salário acima do limite")
+    elif dias_atestado >= 3:
+        status = 'Não tem direito'
+        valor = 0
+        detalhes.append(f"{dias_atestado} dias de atestado (perde o direito)")
+    elif dias_atestado == 2:
+        valor *= 0.25
+        detalhes.append("2 dias de atestado (25% do valor)")
+    elif dias_atestado == 1:
+        valor *= 0.5
+        detalhes.append("1 dia de atestado (50% do valor)")
+
+    if row['horas'] <= 120 and valor > 0:
+        valor = round(valor * 0.5, 2)
+        detalhes.append("Jornada 4h (50%)")
+
+    if dias_ferias > 0 and valor > 0:
+        desconto = min(dias_ferias / 30, 1)
+        valor = round(valor * (1 - desconto), 2)
+        detalhes.append(f"Desconto férias: {dias_ferias} dias")
+
+    return pd.Series({
+        'Valor_Premio': valor,
+        'Status': status,
+        'Detalhes': "; ".join(detalhes),
+        'Qtd_Atestados': dias_atestado
+    })
+
+def calcular_referencia(funcionarios, ausencias):
+    ausencias = ausencias.copy()
+    ausencias['Afastamentos_Normalizado'] = ausencias['Afastamentos'].fillna('').apply(normalizar_texto)
+    return funcionarios.apply(
+        lambda row: calcular_premio(
+            pd.Series({**row, 'horas': row[COL_HORAS], 'salario': row[COL_SALARIO]}), ausencias
+        ),
+        axis=1
+    )
+
+def calcular_vetorizado(funcionarios, ausencias):
+    # Mesmo preparo da leitura do app: coluna normalizada e tipos compactos
+    funcionarios = preparar_planilha(funcionarios.copy())
+    ausencias = preparar_planilha(ausencias.copy(), ['Afastamentos'], compactar=True)
+    agregados = IndiceAusencias(ausencias).agregados()
+    return calcular_premios(funcionarios, agregados, COL_HORAS, COL_SALARIO)
+
+def conferir(funcionarios, ausencias):
+    esperado = calcular_referencia(funcionarios, ausencias)[COLUNAS_RESULTADO]
+    obtido = calcular_vetorizado(funcionarios, ausencias)[COLUNAS_RESULTADO]
+    np.testing.assert_allclose(
+        obtido['Valor_Premio'].to_numpy(dtype=float), esperado['Valor_Premio'].to_numpy(dtype=float)
+    )
+    for coluna in ['Status', 'Detalhes']:
+        assert obtido[coluna].tolist() == esperado[coluna].tolist(), coluna
+    assert obtido['Qtd_Atestados'].astype(int).tolist() == esperado['Qtd_Atestados'].astype(int).tolist()
+    return obtido
+
+def funcionario(matricula, horas=220, salario=2000.0):
+    return {'Matricula': matricula, 'Nome': f'FUNCIONARIO {matricula}', COL_HORAS: horas, COL_SALARIO: salario}
+
+def ausencia(matricula, afastamento, dias=np.nan):
+    return {'Matricula': matricula, 'Dias': dias, 'Afastamentos': afastamento}
+
+CASOS = {
+    'sem ausencias': (
+        [funcionario(1)], [ausencia(99, 'Falta')],
+        (VALOR_BASE, 'Tem direito', '')
+    ),
+    'um atestado': (
+        [funcionario(1)], [ausencia(1, 'Atestado Médico')],
+        (157.5, 'Tem direito', '1 dia de atestado (50% do valor)')
+    ),
+    'dois atestados': (
+        [funcionario(1)], [ausencia(1, 'ATESTADO')] * 2,
+        (78.75, 'Tem direito', '2 dias de atestado (25% do valor)')
+    ),
+    'tres atestados': (
+        [funcionario(1)], [ausencia(1, 'Atestado')] * 3,
+        (0, 'Não tem direito', '3 dias de atestado (perde o direito)')
+    ),
+    'jornada 4h': (
+        [funcionario(1, horas=120)], [ausencia(1, 'Atestado')],
+        (78.75, 'Tem direito', '1 dia de atestado (50% do valor); Jornada 4h (50%)')
+    ),
+    'salario acima do limite': (
+        [funcionario(1, salario=SALARIO_LIMITE + 0.01)], [ausencia(1, 'Férias', '10')],
+        (0, 'Não tem direito', 'Salário acima do limite')
+    ),
+    'ferias dias inteiros': (
+        [funcionario(1)], [ausencia(1, 'Férias', '10'), ausencia(1, 'FERIAS', '5')],
+        (157.5, 'Tem direito', 'Desconto férias: 15 dias')
+    ),
+    'ferias dias decimais': (
+        [funcionario(1)], [ausencia(1, 'Férias', '7.5')],
+        (236.25, 'Tem direito', 'Desconto férias: 7.5 dias')
+    ),
+    'ferias com dia invalido': (
+        [funcionario(1)], [ausencia(1, 'Férias', '6'), ausencia(1, 'Férias', 'abc')],
+        (252.0, 'Tem direito', 'Desconto férias: 6.0 dias')
+    ),
+    'ferias acima de 30 dias': (
+        [funcionario(1, horas=100)], [ausencia(1, 'Férias', '45')],
+        (0, 'Tem direito', 'Jornada 4h (50%); Desconto férias: 45 dias')
+    ),
+    'atraso prevalece': (
+        [funcionario(1, salario=5000)], [ausencia(1, 'Atestado'), ausencia(1, 'Atraso'), ausencia(1, 'Férias', '10')],
+        (0, 'Aguardando decisão', 'Afastamento: Atraso')
+    ),
+    'matricula vazia': (
+        [funcionario(np.nan), funcionario(1)], [ausencia(np.nan, 'Atestado'), ausencia(1, 'Atestado')],
+        (VALOR_BASE, 'Tem direito', '')
+    ),
+}
+
+@pytest.mark.parametrize('nome', CASOS)
+def test_regras_iguais_ao_calculo_por_linha(nome):
+    funcionarios, ausencias, (valor, status, detalhes) = CASOS[nome]
+    obtido = conferir(pd.DataFrame(funcionarios), pd.DataFrame(ausencias)).iloc[0]
+    assert obtido['Valor_Premio'] == pytest.approx(valor)
+    assert obtido['Status'] == status
+    assert obtido['Detalhes'] == detalhes
+
+@pytest.mark.parametrize('semente', range(5))
+def test_bases_aleatorias(semente):
+    rng = np.random.default_rng(semente)
+    n_funcionarios = 300
+    matriculas = rng.choice(np.arange(1, 10_000), n_funcionarios, replace=False).astype(float)
+    matriculas[rng.random(n_funcionarios) < 0.02] = np.nan
+    funcionarios = pd.DataFrame({
+        'Matricula': matriculas,
+        'Nome': [f'FUNCIONARIO {i}' for i in range(n_funcionarios)],
+        COL_HORAS: rng.choice([100, 120, 150, 180, 220], n_funcionarios),
+        COL_SALARIO: rng.uniform(1500, 3500, n_funcionarios).round(2),
+    })
+    n_ausencias = 1500
+    afastamentos = np.array(
+        ['Atestado Médico', 'ATESTADO', 'Férias', 'FERIAS', 'Atraso', 'Falta', 'Licença', None], dtype=object
+    )
+    dias = np.array(['10', '5', '7.5', '30', '12', 'abc', None], dtype=object)
+    ausencias = pd.DataFrame({
+        # Algumas matrículas de ausência não existem na base de funcionários
+        'Matricula': rng.choice(np.append(matriculas, [10_001.0, 10_002.0]), n_ausencias),
+        'Dias': rng.choice(dias, n_ausencias),
+        'Afastamentos': rng.choice(afastamentos, n_ausencias, p=[0.08, 0.07, 0.2, 0.1, 0.02, 0.25, 0.2, 0.08]),
+    })
+    conferir(funcionarios, ausencias)
+
+def test_planilhas_de_exemplo():
+    caminho_func = os.path.join(RAIZ, 'EQUIPPE - Base Funcionarios.xlsx')
+    caminho_aus = os.path.join(RAIZ, 'AUSENCIAS 1125.xlsx')
+    if not (os.path.exists(caminho_func) and os.path.exists(caminho_aus)):
+        pytest.skip('planilhas de exemplo ausentes')
+    funcionarios = pd.read_excel(caminho_func)
+    ausencias = pd.read_excel(caminho_aus)
+    funcionarios.columns = [c.strip() for c in funcionarios.columns]
+    ausencias.columns = [c.strip() for c in ausencias.columns]
+    conferir(funcionarios, ausencias)
@@ -0,0 +1,90 @@
+"""Confere consolidar_matriculas contra as agregações por grupo usadas antes da vetorização."""
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import consolidar_matriculas
+
+def consolidar_por_grupo(df):
+    """Consolidação original, com funções Python por grupo: referência para consolidar_matriculas"""
+    def agregar_detalhes(x):
+        # Juntar todos os detalhes de afastamentos únicos
+        detalhes = []
+        for detalhe in x:
+            if isinstance(detalhe, str) and detalhe:
+                for d in detalhe.split(';'):
+                    d = d.strip()
+                    if d and d not in detalhes:
+                        detalhes.append(d)
+        return "; ".join(detalhes) if detalhes else ""
+
+    def priorizar_status(x):
+        # Prioridade: Não tem direito > Aguardando decisão > Tem direito
+        if "Não tem direito" in x.values:
+            return "Não tem direito"
+        elif "Aguardando decisão" in x.values:
+            for status in x.values:
+                if isinstance(status, str) and "Aguardando decisão" in status:
+                    return status  # Retorna com os detalhes de atraso
+            return "Aguardando decisão"
+        else:
+            return "Tem direito"
+
+    agregacoes = {
+        'Nome': 'first',
+        'Cargo': 'first',
+        'Local': 'first',
+        'Horas_Mensais': 'first',
+        'Data_Admissao': 'first',
+        'Status': priorizar_status,
+        'Valor_Premio': lambda x: x.max(),
+        'Detalhes_Afastamentos': agregar_detalhes,
+        'Observações': 'first',
+        'Observacoes': 'first',
+    }
+    agregacoes = {k: v for k, v in agregacoes.items() if k in df.columns}
+    return df.groupby('Matricula').agg(agregacoes).reset_index()
+
+STATUS = ['Tem direito', 'Não tem direito', 'Aguardando decisão', 'Aguardando decisão (atraso de 15 min)',
+          'Férias', '', np.nan, 7]
+DETALHES = ['Atestado Médico', 'Atraso; Férias', ' Atraso ;; Falta ', 'Férias;Atestado Médico', '', ';',
+            np.nan, 3.5]
+
+def base_aleatoria(semente):
+    rng = np.random.default_rng(semente)
+    n = int(rng.integers(1, 150))
+    df = pd.DataFrame({
+        'Matricula': rng.integers(0, max(2, n // 3), n),
+        'Nome': rng.choice(np.array(['ANA', 'BRUNO', None], dtype=object), n),
+        'Cargo': rng.choice(['CAIXA', 'REPOSITOR'], n),
+        'Local': rng.choice(['LOJA 1', 'LOJA 2'], n),
+        'Horas_Mensais': rng.choice([120, 220], n),
+        'Data_Admissao': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 2000, n), unit='D'),
+        'Status': rng.choice(np.array(STATUS, dtype=object), n),
+        'Valor_Premio': np.where(rng.random(n) < 0.1, np.nan, rng.choice([0, 78.75, 157.5, 315.0], n)),
+        'Detalhes_Afastamentos': rng.choice(np.array(DETALHES, dtype=object), n),
+    })
+    variante = semente % 5
+    if variante == 1:
+        # Coluna de detalhes vazia: o Excel a entrega como float64
+        df['Detalhes_Afastamentos'] = np.nan
+    elif variante == 2:
+        df['Observações'] = rng.choice(np.array(['ok', None], dtype=object), n)
+        df['Observacoes'] = rng.choice(np.array(['ajuste', None], dtype=object), n)
+    elif variante == 3:
+        # Rótulos de índice repetidos, como após concatenar abas
+        df.index = rng.integers(0, 5, n)
+    elif variante == 4:
+        df = df.drop(columns=['Cargo', 'Detalhes_Afastamentos'])
+    return df
+
+@pytest.mark.parametrize('semente', range(300))
+def test_igual_a_consolidacao_por_grupo(semente):
+    df = base_aleatoria(semente)
+    # Mesmos valores; o pandas pode inferir str no lugar de object para as colunas de texto
+    pd.testing.assert_frame_equal(
+        consolidar_matriculas(df), consolidar_por_grupo(df), check_dtype=False, check_index_type=False
+    )
@@ -0,0 +1,49 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from diagnostico import Diagnostico, coletar, etapa
+from fila_exportacao import CONCLUIDA, FilaExportacao
+
+def test_etapas_em_exportacoes_paralelas_mantem_o_nivel():
+    fila = FilaExportacao(max_executando=4, max_pendentes_sessao=4)
+    juntas = threading.Barrier(4)
+
+    def exportar(tarefa):
+        with etapa('exportacao'):
+            juntas.wait(timeout=10)
+            for _ in range(50):
+                with etapa('interna'):
+                    with etapa('gravacao'):
+                        pass
+        return b'ok'
+
+    diagnostico = Diagnostico()
+    with coletar(diagnostico):
+        execucao = diagnostico.execucao
+        with etapa('processamento'):
+            tarefas = [fila.enviar('sessao', f'Exportação {i}', 'a.xlsx', exportar) for i in range(4)]
+            with etapa('tela'):
+                pass
+    # Uma nova execução da sessão enquanto as exportações rodam não recebe as etapas delas
+    time.sleep(0.01)
+    with coletar(diagnostico):
+        with etapa('nova_execucao'):
+            pass
+    fila._executor.shutdown(wait=True)
+
+    assert [t.estado for t in tarefas] == [CONCLUIDA] * 4
+    niveis = {}
+    for registro in diagnostico.registros:
+        niveis.setdefault(registro['etapa'], set()).add((registro['execucao'], registro['nivel']))
+    assert niveis['processamento'] == {(execucao, 0)}
+    assert niveis['tela'] == {(execucao, 1)}
+    # A exportação herda o nível da etapa que a enviou e aninha as suas etapas a partir dele
+    assert niveis['exportacao'] == {(execucao, 1)}
+    assert niveis['interna'] == {(execucao, 2)}
+    assert niveis['gravacao'] == {(execucao, 3)}
+    assert niveis['nova_execucao'] == {(diagnostico.execucao, 0)}
+    assert len(diagnostico.registros) == 2 + 4 * 101 + 1
+    assert list(diagnostico.tabela()['etapa']) == ['nova_execucao']
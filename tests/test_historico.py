@@ -0,0 +1,42 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import historico
+
+COMPETENCIA = '2025-11'
+
+def resultado(*linhas):
+    return pd.DataFrame(
+        [{'Matricula': m, 'Nome': f'FUNCIONARIO {m}', 'Status': 'Tem direito', 'Valor_Premio': v, 'Detalhes': ''}
+         for m, v in linhas]
+    )
+
+def test_reenvio_com_outra_origem_substitui_as_matriculas(tmp_path):
+    caminho = str(tmp_path / 'historico.sqlite3')
+    historico.salvar_resultado(resultado((1, 315.0), (2, 157.5)), COMPETENCIA, 'hashA', caminho=caminho)
+    historico.salvar_resultado(resultado((1, 315.0), (2, 157.5)), COMPETENCIA, 'hashB', caminho=caminho)
+
+    totais = historico.totais_por_competencia(caminho=caminho)
+    assert totais[['funcionarios', 'total_pago']].values.tolist() == [[2, 472.5]]
+    assert totais['origem'].tolist() == ['hashB']
+    linhas = historico.historico_funcionario(1, caminho=caminho)
+    assert linhas[['competencia', 'origem']].values.tolist() == [[COMPETENCIA, 'hashB']]
+
+def test_edicao_acompanha_a_matricula_e_reverte_so_a_origem(tmp_path):
+    caminho = str(tmp_path / 'historico.sqlite3')
+    historico.salvar_resultado(resultado((1, 315.0), (2, 157.5)), COMPETENCIA, 'Unidade A', caminho=caminho)
+    editada = resultado((1, 100.0)).assign(Observacoes='ajuste')
+    historico.salvar_edicoes(editada, COMPETENCIA, 'Unidade A', caminho=caminho)
+    historico.salvar_resultado(resultado((1, 315.0), (2, 157.5)), COMPETENCIA, 'Unidade B', caminho=caminho)
+    historico.salvar_resultado(resultado((3, 315.0)), COMPETENCIA, 'Unidade C', caminho=caminho)
+
+    por_origem = historico.totais_por_competencia(caminho=caminho, por_origem=True)
+    assert por_origem[['origem', 'funcionarios', 'editados']].values.tolist() == [
+        ['Unidade B', 2, 1], ['Unidade C', 1, 0]
+    ]
+    historico.reverter_edicoes(COMPETENCIA, 'Unidade B', caminho=caminho)
+    linha = historico.historico_funcionario(1, caminho=caminho).iloc[0]
+    assert (linha['valor_premio'], linha['editado']) == (315.0, 0)
+    assert historico.totais_por_competencia(caminho=caminho)['total_pago'].tolist() == [787.5]
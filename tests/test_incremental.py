@@ -0,0 +1,66 @@
+"""Confere o recálculo incremental contra o cálculo completo da base de ausências reenviada."""
+import io
+import os
+import sys
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+import relatorio
+
+CAMINHO_FUNC = os.path.join(RAIZ, 'EQUIPPE - Base Funcionarios.xlsx')
+CAMINHO_AUS = os.path.join(RAIZ, 'AUSENCIAS 1125.xlsx')
+DATA_LIMITE = date(2026, 1, 31)
+
+pytestmark = pytest.mark.skipif(
+    not (os.path.exists(CAMINHO_FUNC) and os.path.exists(CAMINHO_AUS)), reason='planilhas de exemplo ausentes'
+)
+
+def excel(df):
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+def reenvio(base, semente):
+    """Base de ausências com linhas removidas, incluídas e alteradas"""
+    rng = np.random.default_rng(semente)
+    atrasos = base.index[base['Afastamentos'] == 'Atraso']
+    removidas = np.concatenate([rng.choice(atrasos, 3, replace=False), rng.choice(base.index, 10, replace=False)])
+    nova = base.drop(index=np.unique(removidas))
+    incluidas = base.loc[rng.choice(base.index, 8, replace=False)].assign(Afastamentos='Atestado Médico')
+    nova = pd.concat([nova, incluidas]).reset_index(drop=True)
+    alteradas = rng.choice(nova.index, 12, replace=False)
+    nova.loc[alteradas[:4], 'Afastamentos'] = 'Férias'
+    nova.loc[alteradas[4:8], 'Afastamentos'] = 'Atraso'
+    nova.loc[alteradas[8:], 'Falta'] = np.where(nova.loc[alteradas[8:], 'Falta'].isna(), 'x', None)
+    return nova
+
+@pytest.mark.parametrize('semente', range(3))
+def test_incremental_igual_ao_calculo_completo(semente):
+    base = pd.read_excel(CAMINHO_AUS)
+    anterior = relatorio.obter_resultado(CAMINHO_FUNC, excel(base), DATA_LIMITE)
+    aus_nova = excel(reenvio(base, semente))
+    incremental = relatorio.obter_resultado(CAMINHO_FUNC, aus_nova, DATA_LIMITE, anterior=anterior)
+    assert relatorio._permite_incremental(anterior, incremental.chave, incremental.df_aus)
+
+    completo = relatorio.calcular_resultado(*relatorio.carregar_bases(CAMINHO_FUNC, aus_nova), DATA_LIMITE)
+    pd.testing.assert_frame_equal(incremental.df_final, completo.df_final)
+    pd.testing.assert_frame_equal(incremental.ferias_aus_all, completo.ferias_aus_all)
+    abas_incremental = relatorio.abas_relatorio_executivo(incremental, DATA_LIMITE)
+    abas_completo = relatorio.abas_relatorio_executivo(completo, DATA_LIMITE)
+    assert [nome for nome, _ in abas_incremental] == [nome for nome, _ in abas_completo]
+    for (nome, df_incremental), (_, df_completo) in zip(abas_incremental, abas_completo):
+        pd.testing.assert_frame_equal(df_incremental, df_completo, obj=nome)
+
+    # Funcionários com status ou valor diferente entre o envio anterior e o cálculo completo do novo
+    antes, depois = anterior.df_final, completo.df_final
+    mudou = (antes['Status'] != depois['Status']) | (antes['Valor_Premio'] != depois['Valor_Premio'])
+    mudancas, recalculados = relatorio.mudancas_desde(anterior, incremental)
+    assert sorted(mudancas['Matricula']) == sorted(depois.loc[mudou, 'Matricula'])
+    assert mudancas['Status_Atual'].tolist() == depois.loc[mudou, 'Status'].tolist()
+    assert not mudancas.empty
+    assert len(mudancas) <= recalculados < len(depois)
+    assert relatorio.mudancas_desde(incremental, incremental) is None
@@ -0,0 +1,45 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from relatorio_html import gerar_relatorios_empresas, somar_por_funcionario
+
+def base_numerica():
+    # Como o Excel entrega: CPF e CNPJ numéricos, com um vazio que torna a coluna float64
+    return pd.DataFrame({
+        'Matricula': [1, 2, 3, 4],
+        'Nome': ['ANA', 'BRUNO', 'CARLA', 'DANIEL'],
+        'CPF': [1234567890.0, 1234567890.0, np.nan, 98765432100.0],
+        'CNPJ': [1234567000190.0, 1234567000190.0, 1234567000190.0, np.nan],
+        'Valor_Premio': [315.0, 157.5, 78.75, 315.0],
+    })
+
+def test_cpf_e_cnpj_numericos_mantem_os_zeros():
+    linhas = somar_por_funcionario(base_numerica())
+    por_nome = linhas.set_index('Nome')
+    assert por_nome.loc['ANA', 'CPF'] == '01234567890'
+    assert por_nome.loc['ANA', 'Valor'] == 472.5
+    assert por_nome.loc['ANA', 'CNPJ'] == '01234567000190'
+    assert por_nome.loc['CARLA', 'CPF'] == ''
+    assert por_nome.loc['DANIEL', 'CPF'] == '98765432100'
+    assert por_nome.loc['DANIEL', 'CNPJ'] == ''
+    assert 'BRUNO' not in por_nome.index
+
+def test_cpf_em_texto_nao_muda():
+    df = base_numerica().astype({'CPF': object})
+    df['CPF'] = ['123.456.789-01', '123.456.789-01', None, ' 98765432100 ']
+    por_nome = somar_por_funcionario(df).set_index('Nome')
+    assert por_nome.loc['ANA', 'CPF'] == '123.456.789-01'
+    assert por_nome.loc['DANIEL', 'CPF'] == '98765432100'
+
+def test_arquivos_e_html_por_cnpj(tmp_path):
+    caminhos = gerar_relatorios_empresas(base_numerica(), str(tmp_path), processos=1)
+    assert sorted(os.path.basename(c) for c in caminhos) == [
+        'relatorio_01234567000190.html', 'relatorio_sem_cnpj.html'
+    ]
+    with open(tmp_path / 'relatorio_01234567000190.html', encoding='utf-8') as f:
+        texto = f.read()
+    assert '<td>01234567890</td>' in texto
+    assert '.0<' not in texto
@@ -0,0 +1,46 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ausencias import IndiceAusencias
+from calculo import calcular_premios
+from leitura import _processar_lote
+from tipos_afastamento import TabelaTipos
+
+TABELA = TabelaTipos(pd.DataFrame({
+    'Tipo de Afastamento': ['Meio Atestado', 'Atestado Duplo', 'Atestado'],
+    'Categoria': ['atestado', 'atestado', 'atestado'],
+    'Peso': [0.5, 2, None],
+}))
+
+def ausencias(*linhas):
+    return pd.DataFrame(
+        [{'Matricula': m, 'Dias': None, 'Afastamentos': a} for m, a in linhas],
+        columns=['Matricula', 'Dias', 'Afastamentos']
+    )
+
+def qtd_atestados(agregados, matriculas):
+    funcionarios = pd.DataFrame({'Matricula': matriculas, 'Horas': 220, 'Salario': 2000.0})
+    return calcular_premios(funcionarios, agregados, 'Horas', 'Salario')['Qtd_Atestados'].tolist()
+
+def test_pesos_fracionarios_sao_somados_antes_de_arredondar():
+    df = ausencias(
+        (1, 'Meio Atestado'), (1, 'Meio Atestado'),
+        (2, 'Meio Atestado'),
+        (3, 'Meio Atestado'), (3, 'Atestado Duplo'),
+        (4, 'Atestado'), (4, 'Falta'),
+    )
+    agregados = IndiceAusencias(df, tabela=TABELA).agregados()
+    assert agregados['Qtd_Atestados'].tolist() == [1.0, 0.5, 2.5, 1.0]
+    # Meio atestado isolado conta como um; meio arredonda para cima
+    assert qtd_atestados(agregados, [1, 2, 3, 4]) == [1, 1, 3, 1]
+
+def test_leitura_em_lotes_soma_as_fracoes():
+    colunas = ['Matricula', 'Dias', 'Afastamentos']
+    agregados = None
+    for lote in ([[1, None, 'Meio Atestado'], [2, None, 'Meio Atestado']],
+                 [[1, None, 'Meio Atestado'], [2, None, 'Atestado']]):
+        agregados = _processar_lote(lote, colunas, [], agregados, TABELA)
+    assert agregados.loc[[1, 2], 'Qtd_Atestados'].tolist() == [1.0, 1.5]
+    assert qtd_atestados(agregados, [1, 2]) == [1, 2]
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+from normalizacao import normalizar_serie, normalizar_texto
+
+# Categorias usadas pelas regras; um afastamento pode cair em mais de uma
+CATEGORIAS_REGRAS = ['atraso', 'atestado', 'ferias']
+
+# Colunas da Tabela de Tipos de Afastamentos (Categoria e Peso são opcionais)
+COLUNA_TIPO = 'tipo de afastamento'
+COLUNA_CATEGORIA = 'categoria'
+COLUNA_PESO = 'peso'
+
+def classificar_por_texto(vocabulario):
+    """Categorias de cada afastamento normalizado pela presença do nome da categoria no texto"""
+    vocabulario = pd.Series(vocabulario, dtype=object)
+    return {c: vocabulario.str.contains(c).to_numpy(dtype=bool) for c in CATEGORIAS_REGRAS}
+
+def classificar(vocabulario, tabela=None):
+    """Categorias e peso de cada afastamento normalizado, pela tabela de tipos quando houver"""
+    if tabela is None:
+        return classificar_por_texto(vocabulario), np.ones(len(vocabulario), dtype='int64')
+    return tabela.classificar(vocabulario)
+
+class TabelaTipos:
+    """Tabela de Tipos de Afastamentos compilada: tipo normalizado -> categorias das regras e peso.
+
+    A categoria vem da coluna Categoria (atraso, atestado, ferias ou outro) e, quando ela não
+    existe ou está vazia, da busca de texto no próprio tipo. O Peso diz quantas ocorrências cada
+    linha de atestado conta (padrão 1, aceita frações como 0,5). Tipos que não estão na tabela são
+    classificados pela busca de texto, como sem tabela.
+    """
+
+    def __init__(self, tabela, chave=None):
+        self.chave = chave
+        colunas = {normalizar_texto(c): c for c in tabela.columns}
+        if COLUNA_TIPO not in colunas:
+            raise ValueError("Coluna 'tipo de afastamento' não encontrada na tabela de tipos de afastamento.")
+        tipos = normalizar_serie(tabela[colunas[COLUNA_TIPO]]).astype(object).to_numpy()
+        # Tipos repetidos: vale a primeira linha
+        manter = (tipos != '') & ~pd.Index(tipos).duplicated()
+        self.tipos = pd.Index(tipos[manter])
+
+        self.categorias = classificar_por_texto(self.tipos)
+        if COLUNA_CATEGORIA in colunas:
+            categoria = normalizar_serie(tabela[colunas[COLUNA_CATEGORIA]]).astype(object).to_numpy()[manter]
+            informada = categoria != ''
+            for c in CATEGORIAS_REGRAS:
+                self.categorias[c] = np.where(informada, categoria == c, self.categorias[c])
+
+        # Pesos podem ser fracionários (meio atestado): o arredondamento só vem depois da soma por Matrícula
+        self.pesos = np.ones(len(self.tipos), dtype='float64')
+        if COLUNA_PESO in colunas:
+            pesos = pd.to_numeric(tabela[colunas[COLUNA_PESO]], errors='coerce').to_numpy(dtype='float64')[manter]
+            self.pesos = np.where(np.isnan(pesos), 1.0, pesos)
+
+    def __len__(self):
+        return len(self.tipos)
+
+    def classificar(self, vocabulario):
+        posicoes = self.tipos.get_indexer(pd.Index(vocabulario, dtype=object))
+        conhecidos = posicoes >= 0
+        por_texto = classificar_por_texto(vocabulario)
+        categorias = {
+            c: np.where(conhecidos, self.categorias[c][posicoes], por_texto[c]) for c in CATEGORIAS_REGRAS
+        }
+        pesos = np.where(conhecidos, self.pesos[posicoes], 1)
+        return categorias, pesos
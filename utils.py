@@ -1,20 +1,110 @@
 import streamlit as st
+import sqlite3
+import uuid
 import pandas as pd
-import io
+import numpy as np
 from datetime import datetime
+from exportacao import escrever_excel
+from diagnostico import etapa
+from historico import salvar_edicoes, reverter_edicoes
+from busca import IndiceBusca, ORDENACOES
+from fila_exportacao import fila
+
+def gravar_historico(funcao, *args):
+    """Repete a edição no histórico da competência e da base em processamento, quando ele está ativo"""
+    competencia = st.session_state.get('competencia_historico')
+    if not competencia:
+        return
+    try:
+        funcao(*args, competencia, st.session_state.get('origem_historico', ''))
+    except sqlite3.Error as e:
+        st.warning(f"Não foi possível gravar no histórico: {e}")
+
+def sessao_exportacao():
+    """Identificador da sessão na fila de exportações"""
+    if 'sessao_exportacao' not in st.session_state:
+        st.session_state.sessao_exportacao = uuid.uuid4().hex
+    return st.session_state.sessao_exportacao
+
+def enviar_exportacao(descricao, nome_arquivo, funcao, chave=None):
+    """Coloca a exportação na fila em segundo plano; o arquivo aparece no painel de exportações"""
+    try:
+        tarefa = fila.enviar(sessao_exportacao(), descricao, nome_arquivo, funcao, chave=chave)
+    except RuntimeError as e:
+        st.warning(str(e))
+        return None
+    if tarefa.terminada:
+        st.info(f"{descricao} já foi gerado com estes dados; está disponível em Exportações.")
+    else:
+        st.info(f"{descricao} em geração; acompanhe em Exportações.")
+    return tarefa
+
+# Colunas que o editor altera; o resto do resultado nunca muda
+COLUNAS_EDITAVEIS = ['Status', 'Valor_Premio', 'Observacoes']
+
+def aplicar_edicoes(base, edicoes):
+    """Resultado com as edições da sessão por cima, sem alterar o resultado compartilhado"""
+    if edicoes.empty:
+        return base
+    # Cópia rasa: só as colunas editáveis são substituídas, as demais continuam compartilhadas
+    df = base.copy(deep=False)
+    editadas = base.index.isin(edicoes.index)
+    for coluna in COLUNAS_EDITAVEIS:
+        serie = base[coluna] if coluna in base.columns else pd.Series('', index=base.index, dtype=object)
+        df[coluna] = serie.where(~editadas, edicoes[coluna].reindex(base.index))
+    return df
+
+def registrar_edicoes(linhas):
+    """Junta as linhas editadas às edições da sessão e remonta modified_df"""
+    edicoes = st.session_state.edicoes
+    linhas = linhas[COLUNAS_EDITAVEIS]
+    if not edicoes.empty:
+        linhas = pd.concat([edicoes[~edicoes.index.isin(linhas.index)], linhas])
+    st.session_state.edicoes = linhas
+    st.session_state.modified_df = aplicar_edicoes(st.session_state.base_edicao, linhas)
 
 def salvar_alteracoes(idx, novo_status, novo_valor, nova_obs, nome):
     """Função auxiliar para salvar alterações"""
-    st.session_state.modified_df.at[idx, 'Status'] = novo_status
-    st.session_state.modified_df.at[idx, 'Valor_Premio'] = novo_valor
-    st.session_state.modified_df.at[idx, 'Observacoes'] = nova_obs
+    registrar_edicoes(pd.DataFrame(
+        {'Status': [novo_status], 'Valor_Premio': [novo_valor], 'Observacoes': [nova_obs]}, index=[idx]
+    ))
+    gravar_historico(salvar_edicoes, st.session_state.modified_df.loc[[idx]])
     st.session_state.expanded_item = idx
     st.session_state.last_saved = nome
     st.session_state.show_success = True
 
+def salvar_alteracoes_lote(original, editado):
+    """Aplica de uma vez as alterações feitas na tabela da página"""
+    colunas = ['Status', 'Valor_Premio', 'Observacoes']
+    alterado = pd.Series(False, index=editado.index)
+    for coluna in colunas:
+        antes, depois = original[coluna], editado[coluna]
+        alterado |= (antes != depois) & ~(antes.isna() & depois.isna())
+    if not alterado.any():
+        return 0
+    idx = editado.index[alterado]
+    registrar_edicoes(editado.loc[idx, colunas])
+    gravar_historico(salvar_edicoes, st.session_state.modified_df.loc[idx])
+    st.session_state.last_saved = f"{len(idx)} funcionário(s)"
+    st.session_state.show_success = True
+    return len(idx)
+
+def indice_busca(df):
+    """Índice de busca do editor, reconstruído só quando o resultado base é substituído"""
+    # As edições mudam Status, Valor e Observações, nunca Nome ou Matrícula, então o índice
+    # só fica desatualizado quando chega um resultado novo
+    if st.session_state.get('indice_busca_df') is not df:
+        st.session_state.indice_busca = IndiceBusca(df)
+        st.session_state.indice_busca_df = df
+    return st.session_state.indice_busca
+
 def editar_valores_status(df):
     if 'modified_df' not in st.session_state:
-        st.session_state.modified_df = df.copy()
+        # df é o resultado compartilhado entre as sessões: a sessão guarda só as próprias edições
+        # e, sem edições, modified_df é o próprio resultado, sem cópia
+        st.session_state.base_edicao = df
+        st.session_state.edicoes = pd.DataFrame(columns=COLUNAS_EDITAVEIS)
+        st.session_state.modified_df = df
     
     if 'expanded_item' not in st.session_state:
         st.session_state.expanded_item = None
@@ -36,10 +126,6 @@ def editar_valores_status(df):
         key="status_principal_filter_unique"
     )
     
-    df_filtrado = st.session_state.modified_df.copy()
-    if status_principal != "Todos":
-        df_filtrado = df_filtrado[df_filtrado['Status'] == status_principal]
-    
     st.subheader("Buscar Funcionários")
     col1, col2, col3 = st.columns(3)
     
@@ -50,24 +136,17 @@ def editar_valores_status(df):
     with col3:
         ordem = st.selectbox(
             "Ordenar por:",
-            options=["Nome (A-Z)", "Nome (Z-A)", "Matrícula (Crescente)", "Matrícula (Decrescente)"],
+            options=ORDENACOES,
             key="ordem_select_unique"
         )
     
-    if matricula_busca:
-        df_filtrado = df_filtrado[df_filtrado['Matricula'].astype(str).str.contains(matricula_busca)]
-    if nome_busca:
-        df_filtrado = df_filtrado[df_filtrado['Nome'].str.contains(nome_busca, case=False)]
-    
-    # Ordenação
-    if ordem == "Nome (A-Z)":
-        df_filtrado = df_filtrado.sort_values('Nome')
-    elif ordem == "Nome (Z-A)":
-        df_filtrado = df_filtrado.sort_values('Nome', ascending=False)
-    elif ordem == "Matrícula (Crescente)":
-        df_filtrado = df_filtrado.sort_values('Matricula')
-    elif ordem == "Matrícula (Decrescente)":
-        df_filtrado = df_filtrado.sort_values('Matricula', ascending=False)
+    # Filtros e ordenação sobre o índice de busca; só as linhas selecionadas são copiadas
+    df_atual = st.session_state.modified_df
+    indice = indice_busca(st.session_state.base_edicao)
+    mascara = indice.buscar(matricula_busca, nome_busca)
+    if status_principal != "Todos":
+        mascara &= (df_atual['Status'] == status_principal).to_numpy()
+    df_filtrado = df_atual.iloc[indice.posicoes(mascara, ordem)]
     
     # Métricas
     st.subheader("Métricas do Filtro Atual")
@@ -84,43 +163,90 @@ def editar_valores_status(df):
         st.success(f"✅ Alterações salvas com sucesso para {st.session_state.last_saved}!")
         st.session_state.show_success = False
     
-    # Editor de dados por linhas individuais
+    # Editor de dados paginado: só a página visível é renderizada
     st.subheader("Editor de Dados")
-    
-    for idx, row in df_filtrado.iterrows():
-        with st.expander(
-            f"🧑‍💼 {row['Nome']} - Matrícula: {row['Matricula']}", 
-            expanded=st.session_state.expanded_item == idx
-        ):
-            col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        modo_edicao = st.radio(
+            "Modo de edição",
+            options=["Tabela (em lote)", "Individual"],
+            horizontal=True,
+            key="modo_edicao_unique"
+        )
+    with col2:
+        tamanho_pagina = st.selectbox("Funcionários por página", options=[25, 50, 100, 200], key="tamanho_pagina_unique")
+    total_paginas = max(1, -(-len(df_filtrado) // tamanho_pagina))
+    # Filtro novo pode reduzir o número de páginas
+    if st.session_state.get("pagina_editor_unique", 1) > total_paginas:
+        st.session_state.pagina_editor_unique = total_paginas
+    with col3:
+        pagina = st.number_input(
+            f"Página (de {total_paginas})",
+            min_value=1,
+            max_value=total_paginas,
+            step=1,
+            key="pagina_editor_unique"
+        )
+    df_pagina = df_filtrado.iloc[(pagina - 1) * tamanho_pagina:pagina * tamanho_pagina]
+
+    if modo_edicao == "Tabela (em lote)":
+        original = df_pagina.reindex(columns=['Matricula', 'Nome', 'Status', 'Valor_Premio', 'Observacoes'])
+        original['Observacoes'] = original['Observacoes'].fillna('').astype(str)
+        opcoes_status = list(dict.fromkeys(status_options[1:] + original['Status'].dropna().astype(str).tolist()))
+        editado = st.data_editor(
+            original,
+            column_config={
+                'Status': st.column_config.SelectboxColumn("Status", options=opcoes_status, required=True),
+                'Valor_Premio': st.column_config.NumberColumn(
+                    "Valor do Prêmio", min_value=0.0, max_value=1000.0, step=50.0, format="%.2f"
+                ),
+                'Observacoes': st.column_config.TextColumn("Observações"),
+            },
+            disabled=['Matricula', 'Nome'],
+            hide_index=True,
+            width="stretch",
+            key=f"editor_lote_{pagina}_{tamanho_pagina}_{len(df_filtrado)}_{df_pagina.index[:1].tolist()}"
+        )
+        if st.button("Salvar Alterações da Página", key="save_lote_unique"):
+            if salvar_alteracoes_lote(original, editado):
+                st.rerun()
+            else:
+                st.info("Nenhuma alteração na página.")
+    else:
+        for idx, row in df_pagina.iterrows():
+            with st.expander(
+                f"🧑‍💼 {row['Nome']} - Matrícula: {row['Matricula']}", 
+                expanded=st.session_state.expanded_item == idx
+            ):
+                col1, col2 = st.columns(2)
             
-            with col1:
-                novo_status = st.selectbox(
-                    "Status",
-                    options=status_options[1:],
-                    index=status_options[1:].index(row['Status']) if row['Status'] in status_options[1:] else 0,
-                    key=f"status_{idx}_{row['Matricula']}"
-                )
+                with col1:
+                    novo_status = st.selectbox(
+                        "Status",
+                        options=status_options[1:],
+                        index=status_options[1:].index(row['Status']) if row['Status'] in status_options[1:] else 0,
+                        key=f"status_{idx}_{row['Matricula']}"
+                    )
                 
-                novo_valor = st.number_input(
-                    "Valor do Prêmio",
-                    min_value=0.0,
-                    max_value=1000.0,
-                    value=float(row['Valor_Premio']),
-                    step=50.0,
-                    format="%.2f",
-                    key=f"valor_{idx}_{row['Matricula']}"
-                )
+                    novo_valor = st.number_input(
+                        "Valor do Prêmio",
+                        min_value=0.0,
+                        max_value=1000.0,
+                        value=float(row['Valor_Premio']),
+                        step=50.0,
+                        format="%.2f",
+                        key=f"valor_{idx}_{row['Matricula']}"
+                    )
             
-            with col2:
-                nova_obs = st.text_area(
-                    "Observações",
-                    value=row.get('Observacoes', ''),
-                    key=f"obs_{idx}_{row['Matricula']}"
-                )
+                with col2:
+                    nova_obs = st.text_area(
+                        "Observações",
+                        value=row.get('Observacoes', ''),
+                        key=f"obs_{idx}_{row['Matricula']}"
+                    )
             
-            if st.button("Salvar Alterações", key=f"save_{idx}_{row['Matricula']}"):
-                salvar_alteracoes(idx, novo_status, novo_valor, nova_obs, row['Nome'])
+                if st.button("Salvar Alterações", key=f"save_{idx}_{row['Matricula']}"):
+                    salvar_alteracoes(idx, novo_status, novo_valor, nova_obs, row['Nome'])
     
     # Botões de ação geral
     st.subheader("Ações Gerais")
@@ -128,135 +254,141 @@ def editar_valores_status(df):
     
     with col1:
         if st.button("Reverter Todas as Alterações", key="revert_all_unique"):
-            st.session_state.modified_df = df.copy()
+            st.session_state.edicoes = pd.DataFrame(columns=COLUNAS_EDITAVEIS)
+            st.session_state.modified_df = st.session_state.base_edicao
+            gravar_historico(reverter_edicoes)
             st.session_state.expanded_item = None
             st.session_state.show_success = False
             st.warning("⚠️ Todas as alterações foram revertidas!")
     
     with col2:
         if st.button("Exportar Arquivo Final", key="export_unique"):
-            output = exportar_novo_excel(st.session_state.modified_df)
-            if output:
-                st.download_button(
-                    label="📥 Baixar Arquivo Excel",
-                    data=output,
-                    file_name="funcionarios_premios.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    key="download_unique"
-                )
-            else:
-                st.error("Erro ao gerar o arquivo Excel.")
+            # modified_df é remontado a cada edição, nunca alterado: as edições seguintes não mudam o arquivo
+            df_exportar = st.session_state.modified_df
+            enviar_exportacao(
+                "Arquivo Final", "funcionarios_premios.xlsx",
+                lambda tarefa: arquivo_final(df_exportar, tarefa.avisos.append, tarefa.avancar),
+                chave=('final', st.session_state.get('chave_resultado'),
+                       int(pd.util.hash_pandas_object(df_exportar).sum())),
+            )
     
     return st.session_state.modified_df
 
-def exportar_novo_excel(df):
-    try:
-        output = io.BytesIO()
-        
-        # Garantir que cada funcionário tenha apenas uma linha no dataframe final
-        # Agrupando por Matricula e conservando as informações relevantes
-        if 'Matricula' in df.columns and len(df) > 0:
-            # Garantir que o DataFrame já esteja agrupado por Matrícula (deve estar, após calcular_premio)
-            if df['Matricula'].duplicated().any():
-                st.warning("Foram encontradas múltiplas linhas por funcionário. Agrupando automaticamente...")
-                
-                # Funções para agregação
-                def agregar_detalhes(x):
-                    # Juntar todos os detalhes de afastamentos únicos
-                    detalhes = []
-                    for detalhe in x:
-                        if isinstance(detalhe, str) and detalhe:
-                            for d in detalhe.split(';'):
-                                d = d.strip()
-                                if d and d not in detalhes:
-                                    detalhes.append(d)
-                    return "; ".join(detalhes) if detalhes else ""
-                
-                def priorizar_status(x):
-                    # Prioridade: Não tem direito > Aguardando decisão > Tem direito
-                    if "Não tem direito" in x.values:
-                        return "Não tem direito"
-                    elif "Aguardando decisão" in x.values:
-                        for status in x.values:
-                            if isinstance(status, str) and "Aguardando decisão" in status:
-                                return status  # Retorna com os detalhes de atraso
-                        return "Aguardando decisão"
-                    else:
-                        return "Tem direito"
-                
-                def maior_valor(x):
-                    return x.max()
-                
-                def primeiro_valor(x):
-                    return x.iloc[0] if not x.empty else ""
-                
-                # Definir agregações por coluna
-                agregacoes = {
-                    'Nome': 'first',
-                    'Cargo': 'first',
-                    'Local': 'first',
-                    'Horas_Mensais': 'first',
-                    'Data_Admissao': 'first',
-                    'Status': priorizar_status,
-                    'Valor_Premio': maior_valor,
-                    'Detalhes_Afastamentos': agregar_detalhes,
-                    'Observações': 'first' if 'Observações' in df.columns else None,
-                    'Observacoes': 'first' if 'Observacoes' in df.columns else None
-                }
-                
-                # Remover colunas que não existem no DataFrame
-                agregacoes = {k: v for k, v in agregacoes.items() if k in df.columns}
-                
-                # Agrupar o DataFrame
-                df = df.groupby('Matricula').agg(agregacoes).reset_index()
+# Ordem crescente de prioridade do Status quando um funcionário aparece em mais de uma linha
+PRIORIDADE_STATUS = ["Tem direito", "Aguardando decisão", "Não tem direito"]
+
+COLUNAS_CONSOLIDADAS = [
+    'Nome', 'Cargo', 'Local', 'Horas_Mensais', 'Data_Admissao',
+    'Status', 'Valor_Premio', 'Detalhes_Afastamentos', 'Observações', 'Observacoes'
+]
+
+def _so_texto(serie):
+    # Valores que não são texto (NaN de colunas vazias, números) viram NaN em coluna object
+    serie = serie.astype(object)
+    return serie.where(serie.map(lambda v: isinstance(v, str)))
+
+def consolidar_matriculas(df):
+    """Junta as linhas repetidas de cada Matrícula numa só, em operações por coluna"""
+    colunas = [c for c in COLUNAS_CONSOLIDADAS if c in df.columns]
+    agregacoes = {c: 'max' if c == 'Valor_Premio' else 'first' for c in colunas
+                  if c not in ('Status', 'Detalhes_Afastamentos')}
+    grupos = df.groupby('Matricula')
+    resultado = grupos.agg(agregacoes) if agregacoes else pd.DataFrame(index=grupos.size().index)
+
+    if 'Status' in df.columns:
+        # Prioridade: Não tem direito > Aguardando decisão > Tem direito
+        prioridade = pd.Series(
+            pd.Categorical(df['Status'], categories=PRIORIDADE_STATUS, ordered=True), index=df.index
+        ).groupby(df['Matricula']).max().reindex(resultado.index)
+        # Em "Aguardando decisão" vale o primeiro status que contém o texto (com os detalhes de atraso)
+        contem_aguardando = _so_texto(df['Status']).str.contains('Aguardando decisão', na=False, regex=False)
+        primeiro_aguardando = df.loc[contem_aguardando, 'Status'].groupby(
+            df.loc[contem_aguardando, 'Matricula']).first().reindex(resultado.index)
+        resultado['Status'] = np.select(
+            [prioridade == 'Não tem direito', prioridade == 'Aguardando decisão'],
+            ['Não tem direito', primeiro_aguardando.astype(object)],
+            default='Tem direito'
+        )
+
+    if 'Detalhes_Afastamentos' in df.columns:
+        # Afastamentos únicos de cada funcionário, na ordem em que aparecem
+        itens = pd.DataFrame({
+            'Matricula': df['Matricula'].to_numpy(),
+            'Item': _so_texto(df['Detalhes_Afastamentos']).str.split(';').to_numpy(),
+        }).explode('Item')
+        itens['Item'] = itens['Item'].str.strip()
+        itens = itens[itens['Item'].notna() & (itens['Item'] != '')].drop_duplicates()
+        resultado['Detalhes_Afastamentos'] = (
+            itens.groupby('Matricula')['Item'].agg('; '.join).reindex(resultado.index, fill_value='')
+        )
+
+    return resultado[colunas].reset_index()
+
+def arquivo_final(df, avisar, progresso=None):
+    """Excel final com uma aba por status e o resumo; os avisos vão para avisar(texto).
+
+    progresso(fração, mensagem), quando informado, é chamado ao fim de cada etapa.
+    """
+    # Garantir que cada funcionário tenha apenas uma linha no dataframe final
+    # Agrupando por Matricula e conservando as informações relevantes
+    if 'Matricula' in df.columns and len(df) > 0:
+        # Garantir que o DataFrame já esteja agrupado por Matrícula (deve estar, após calcular_premio)
+        if df['Matricula'].duplicated().any():
+            avisar("Foram encontradas múltiplas linhas por funcionário. Agrupando automaticamente...")
+            
+            with etapa('consolidacao_matriculas', df) as registro:
+                df = consolidar_matriculas(df)
+                registro['saida'] = df
+            if progresso:
+                progresso(0.4, 'Funcionários consolidados')
 
-        # Categorizar os funcionários por status
+    # Categorizar os funcionários por status
+    with etapa('abas_status', df) as registro:
         df_tem_direito = df[df['Status'].str.contains('Tem direito', na=False)].copy()
         df_nao_tem_direito = df[df['Status'].str.contains('Não tem direito', na=False)].copy()
         df_aguardando_decisao = df[df['Status'].str.contains('Aguardando decisão', na=False)].copy()
+        registro['saida'] = len(df_tem_direito) + len(df_nao_tem_direito) + len(df_aguardando_decisao)
 
-        # Criar o arquivo Excel
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Aba com os funcionários com direito
-            if not df_tem_direito.empty:
-                df_tem_direito.to_excel(writer, index=False, sheet_name='Tem Direito')
-            else:
-                st.warning("Nenhum funcionário com direito foi encontrado.")
+    # Criar o arquivo Excel
+    abas = []
+    # Aba com os funcionários com direito
+    if not df_tem_direito.empty:
+        abas.append(('Tem Direito', df_tem_direito))
+    else:
+        avisar("Nenhum funcionário com direito foi encontrado.")
 
-            # Aba com os funcionários sem direito
-            if not df_nao_tem_direito.empty:
-                df_nao_tem_direito.to_excel(writer, index=False, sheet_name='Não Tem Direito')
-            else:
-                st.warning("Nenhum funcionário sem direito foi encontrado.")
+    # Aba com os funcionários sem direito
+    if not df_nao_tem_direito.empty:
+        abas.append(('Não Tem Direito', df_nao_tem_direito))
+    else:
+        avisar("Nenhum funcionário sem direito foi encontrado.")
 
-            # Aba com os funcionários aguardando decisão
-            if not df_aguardando_decisao.empty:
-                df_aguardando_decisao.to_excel(writer, index=False, sheet_name='Aguardando Decisão')
-            else:
-                st.warning("Nenhum funcionário aguardando decisão foi encontrado.")
+    # Aba com os funcionários aguardando decisão
+    if not df_aguardando_decisao.empty:
+        abas.append(('Aguardando Decisão', df_aguardando_decisao))
+    else:
+        avisar("Nenhum funcionário aguardando decisão foi encontrado.")
 
-            # Aba com o resumo
-            resumo_data = [
-                ['RESUMO DO PROCESSAMENTO'],
-                [f'Data de Geração: {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}'],
-                [''],
-                ['Métricas Gerais'],
-                [f'Total de Funcionários Processados: {len(df)}'],
-                [f'Total de Funcionários com Direito: {len(df_tem_direito)}'],
-                [f'Total de Funcionários sem Direito: {len(df_nao_tem_direito)}'],
-                [f'Total de Funcionários Aguardando Decisão: {len(df_aguardando_decisao)}'],
-            ]
-            
-            pd.DataFrame(resumo_data).to_excel(
-                writer,
-                index=False,
-                header=False,
-                sheet_name='Resumo'
-            )
+    # Aba com o resumo
+    resumo_data = [
+        ['RESUMO DO PROCESSAMENTO'],
+        [f'Data de Geração: {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}'],
+        [''],
+        ['Métricas Gerais'],
+        [f'Total de Funcionários Processados: {len(df)}'],
+        [f'Total de Funcionários com Direito: {len(df_tem_direito)}'],
+        [f'Total de Funcionários sem Direito: {len(df_nao_tem_direito)}'],
+        [f'Total de Funcionários Aguardando Decisão: {len(df_aguardando_decisao)}'],
+    ]
+    abas.append(('Resumo', pd.DataFrame(resumo_data)))
 
-        output.seek(0)
-        return output.getvalue()
+    if progresso:
+        progresso(0.6, 'Gravando o Excel')
+    return escrever_excel(abas, sem_cabecalho=['Resumo'])
 
+def exportar_novo_excel(df):
+    try:
+        return arquivo_final(df, st.warning)
     except Exception as e:
         st.error(f"Erro ao exportar relatório: {e}")
         return None